@@ -72,6 +72,8 @@ const render = createRender(() => {
 	const [tools] = useModelState("tools");
 	const [title] = useModelState("title");
 	const [historyIndex] = useModelState("history_index");
+	const [canResume] = useModelState("can_resume");
+	const [earlierCount] = useModelState("earlier_count");
 
 	const [draft, setDraft] = React.useState("");
 	const [logLevel, setLogLevel] = React.useState("minimal"); // minimal | tools | debug
@@ -255,6 +257,15 @@ const render = createRender(() => {
 						>
 							Stop
 						</button>
+						{canResume ? (
+							<button
+								className="lcw_btn"
+								onClick={() => model.send({ type: "resume" })}
+								disabled={status !== "idle"}
+							>
+								Resume
+							</button>
+						) : null}
 						<button className="lcw_btn" onClick={() => model.send({ type: "reset" })}>
 							Clear
 						</button>
@@ -263,6 +274,14 @@ const render = createRender(() => {
 
 				<div className="lcw_chat" ref={chatRef}>
 					<div className="lcw_chat_inner">
+						{earlierCount ? (
+							<button
+								className="lcw_btn lcw_btn--block"
+								onClick={() => model.send({ type: "load_earlier" })}
+							>
+								Load earlier messages ({earlierCount})
+							</button>
+						) : null}
 						{displayedMessages.map((m) => (
 							<Message key={m.id} message={m} logLevel={logLevel} />
 						))}
@@ -1,5 +1,11 @@
-from .widget import LangChainWidget
-from .testing import TestChatModel, tool_call
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .testing import TestChatModel, tool_call
+    from .widget import LangChainWidget
 
 __version__ = "0.0.1"
 
@@ -9,3 +15,24 @@ __all__ = [
     "tool_call",
     "__version__",
 ]
+
+# Public names are imported on first attribute access (PEP 562), so scripts
+# that only need the runtime or `TestChatModel` don't pay for `anywidget`.
+_LAZY_ATTRS = {
+    "LangChainWidget": ".widget",
+    "TestChatModel": ".testing",
+    "tool_call": ".testing",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
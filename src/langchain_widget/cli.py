@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from .history import HistoryStore
+
+
+def _add_filters(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--since", help="Only conversations updated at or after this ISO date."
+    )
+    parser.add_argument(
+        "--until", help="Only conversations updated at or before this ISO date."
+    )
+    parser.add_argument(
+        "--id",
+        dest="ids",
+        action="append",
+        help="Only this conversation id (repeatable).",
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="langchain-widget-history",
+        description="Export or import langchain-widget conversation history as JSONL.",
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=None,
+        help="History database (default: ~/.langchain_widget/history.sqlite).",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser(
+        "export", help="Write conversations to a JSONL file (.gz/.bz2/.xz compress)."
+    )
+    export.add_argument("path", type=Path)
+    _add_filters(export)
+
+    import_ = commands.add_parser(
+        "import", help="Load conversations from a JSONL file."
+    )
+    import_.add_argument("path", type=Path)
+    import_.add_argument("--batch-size", type=int, default=500)
+    _add_filters(import_)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    store = HistoryStore(args.db)
+    if args.command == "export":
+        count = store.export(
+            args.path, since=args.since, until=args.until, ids=args.ids
+        )
+        print(f"Exported {count} conversations to {args.path}")
+    else:
+        count = store.import_(
+            args.path,
+            since=args.since,
+            until=args.until,
+            ids=args.ids,
+            batch_size=args.batch_size,
+        )
+        print(f"Imported {count} conversations from {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,32 @@
 from __future__ import annotations
 
+import asyncio
+import bz2
+import datetime as _dt
+import gzip
+import inspect
+import io
+import itertools
 import json
+import lzma
+import re
 import sqlite3
+import weakref
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 
 def default_history_path() -> Path:
@@ -15,6 +37,125 @@ def _ensure_parent_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
+_COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+DateLike = Union[str, _dt.datetime, _dt.date, None]
+
+HistoryChange = Dict[str, Any]
+
+# Batches with more changed conversations than this are published as a single
+# {"op": "reload"}; the change log keeps this many entries for lagging readers.
+_MAX_PUSHED_CHANGES = 200
+_CHANGE_LOG_RETENTION = 10_000
+
+# Spilled transcript messages: spill rows, plus the messages of the saved
+# conversation at positions without a spill row.
+_SPILLED_SQL = """
+    SELECT seq, role, message_json
+    FROM transcript_spill
+    WHERE conversation_id = :id AND seq >= :start AND seq < :stop
+    UNION ALL
+    SELECT j.key, json_extract(j.value, '$.role'), j.value
+    FROM conversations AS c, json_each(c.messages_json) AS j
+    WHERE c.id = :id AND j.key >= :start AND j.key < :stop
+        AND NOT EXISTS (
+            SELECT 1 FROM transcript_spill AS s
+            WHERE s.conversation_id = :id AND s.seq = j.key
+        )
+"""
+
+# Copies the saved messages of conversation `:id` below position `:stop` into
+# spill rows, for a widget whose transcript still relies on them.
+_HOLD_SAVED_SQL = """
+    INSERT OR IGNORE INTO transcript_spill (conversation_id, seq, role, message_json)
+    SELECT c.id, j.key, COALESCE(json_extract(j.value, '$.role'), ''), j.value
+    FROM conversations AS c, json_each(c.messages_json) AS j
+    WHERE c.id = :id AND j.key < :stop
+"""
+
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def _iter_json_array(text: str) -> Iterator[Any]:
+    """Decode the items of a JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    idx = _JSON_WHITESPACE.match(text).end()
+    if not text.startswith("[", idx):
+        raise ValueError("Invalid messages payload in history store.")
+    idx = _JSON_WHITESPACE.match(text, idx + 1).end()
+    if text.startswith("]", idx):
+        return
+    while True:
+        item, idx = decoder.raw_decode(text, idx)
+        yield item
+        idx = _JSON_WHITESPACE.match(text, idx).end()
+        if not text.startswith(",", idx):
+            return
+        idx = _JSON_WHITESPACE.match(text, idx + 1).end()
+
+
+def _prune_changes(conn: sqlite3.Connection) -> None:
+    """Keep the newest `_CHANGE_LOG_RETENTION` change log entries."""
+    conn.execute(
+        """
+        DELETE FROM history_changes
+        WHERE seq <= (SELECT MAX(seq) FROM history_changes) - ?
+        """,
+        (_CHANGE_LOG_RETENTION,),
+    )
+
+
+_SHARED_STORES: "weakref.WeakValueDictionary[str, HistoryStore]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _open_jsonl(path: Path, mode: str) -> IO[str]:
+    """Open a JSONL file for text I/O, (de)compressing by file suffix."""
+    opener = _COMPRESSED_OPENERS.get(path.suffix.lower())
+    if opener is None:
+        return io.open(path, mode, encoding="utf-8")
+    return opener(path, mode + "t", encoding="utf-8")
+
+
+def _iso_bound(value: DateLike, *, end: bool = False) -> Optional[str]:
+    """
+    Normalize a `since`/`until` bound to a UTC ISO timestamp that compares
+    correctly with stored `updated_at` values. A bare date covers the whole
+    day, so as an `end` bound it means the last instant of that day. Naive
+    times are taken as UTC.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = _dt.date.fromisoformat(value)
+        except ValueError:
+            value = _dt.datetime.fromisoformat(value)
+    if not isinstance(value, _dt.datetime):
+        value = _dt.datetime.combine(value, _dt.time.max if end else _dt.time.min)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=_dt.timezone.utc)
+    return value.astimezone(_dt.timezone.utc).isoformat()
+
+
+def iter_jsonl(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Yield one record per non-empty line of a (possibly compressed) JSONL file."""
+    with _open_jsonl(Path(path), "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
 @dataclass(frozen=True)
 class HistoryItem:
     id: str
@@ -36,6 +177,23 @@ class HistoryStore:
         self.path = Path(path) if path is not None else default_history_path()
         _ensure_parent_dir(self.path)
         self._init_db()
+        self._subscribers: List[Callable[[], Any]] = []
+        self._holders: List[Callable[[], Any]] = []
+        self._change_seq = 0
+        self._watch_conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._poll_task: Optional[asyncio.Task[None]] = None
+
+    @classmethod
+    def shared(cls, path: Optional[Path] = None) -> "HistoryStore":
+        """Return the process-wide store for `path`, creating it on first use."""
+        path = Path(path) if path is not None else default_history_path()
+        key = str(path.resolve())
+        store = _SHARED_STORES.get(key)
+        if store is None:
+            store = cls(Path(key))
+            _SHARED_STORES[key] = store
+        return store
 
     def _connect(self) -> sqlite3.Connection:
         conn = sqlite3.connect(str(self.path))
@@ -55,8 +213,58 @@ class HistoryStore:
                 )
                 """
             )
+            # (updated_at, id) orders `list` and keys the pages of `_iter_rows`.
+            conn.execute("DROP INDEX IF EXISTS idx_updated_at")
             conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_updated_at ON conversations(updated_at)"
+                "CREATE INDEX IF NOT EXISTS idx_updated_at_id ON conversations(updated_at, id)"
+            )
+            # Change log filled by triggers, so every connection and process
+            # can tell exactly which conversations changed.
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS history_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL
+                )
+                """
+            )
+            for event, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+                conn.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS conversations_{event.lower()}_log
+                    AFTER {event} ON conversations
+                    BEGIN
+                        INSERT INTO history_changes (id) VALUES ({row}.id);
+                    END
+                    """
+                )
+            # Writers without subscribers never dispatch, so prune on open too.
+            _prune_changes(conn)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS transcript_spill (
+                    conversation_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    message_json TEXT NOT NULL,
+                    PRIMARY KEY (conversation_id, seq)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoint_log (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    state_json TEXT NOT NULL,
+                    transcript_start INTEGER NOT NULL,
+                    messages_json TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_checkpoint_log_id ON checkpoint_log(id, seq)"
             )
 
     def list(self, *, limit: int = 50) -> List[HistoryItem]:
@@ -94,6 +302,164 @@ class HistoryStore:
                 """,
                 (id, title, created_at, updated_at, payload),
             )
+        self._dispatch_changes()
+
+    def iter_conversations(
+        self,
+        *,
+        since: DateLike = None,
+        until: DateLike = None,
+        ids: Optional[Sequence[str]] = None,
+        batch_size: int = 500,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream full conversations ordered by `updated_at`, `batch_size` rows at
+        a time. `since`/`until` bound `updated_at` (inclusive; a bare date
+        covers that whole day); `ids` restricts the export to the given
+        conversations.
+
+        Each batch is a separate short read, so writers are not blocked while
+        the caller consumes the rows.
+        """
+        if ids is not None:
+            for id_batch in _batched(ids, batch_size):
+                yield from self._iter_rows(since, until, id_batch, batch_size)
+            return
+        yield from self._iter_rows(since, until, None, batch_size)
+
+    def _iter_rows(
+        self,
+        since: DateLike,
+        until: DateLike,
+        ids: Optional[List[str]],
+        batch_size: int,
+    ) -> Iterator[Dict[str, Any]]:
+        where: List[str] = []
+        params: List[Any] = []
+        if since is not None:
+            where.append("updated_at >= ?")
+            params.append(_iso_bound(since))
+        if until is not None:
+            where.append("updated_at <= ?")
+            params.append(_iso_bound(until, end=True))
+        if ids is not None:
+            where.append(f"id IN ({', '.join('?' for _ in ids)})")
+            params.extend(ids)
+        sql = """
+            SELECT id, title, created_at, updated_at, messages_json
+            FROM conversations
+            WHERE {}
+            ORDER BY updated_at, id
+            LIMIT ?
+        """
+
+        # Keyset pagination: resume after the last row of the previous batch
+        # instead of keeping a cursor (and its read lock) open across yields.
+        last: List[Any] = []
+        while True:
+            clauses = where + (["(updated_at, id) > (?, ?)"] if last else [])
+            with self._connect() as conn:
+                rows = conn.execute(
+                    sql.format(" AND ".join(clauses) or "1"),
+                    [*params, *last, batch_size],
+                ).fetchall()
+            for row in rows:
+                record = dict(row)
+                record["messages"] = json.loads(record.pop("messages_json"))
+                yield record
+            if len(rows) < batch_size:
+                return
+            last = [rows[-1]["updated_at"], rows[-1]["id"]]
+
+    def export(
+        self,
+        path: Union[str, Path],
+        *,
+        since: DateLike = None,
+        until: DateLike = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> int:
+        """
+        Write conversations to a JSONL file, one conversation per line.
+
+        A `.gz`, `.bz2` or `.xz` suffix compresses the output. Rows are
+        streamed, so memory use does not grow with the store size. Returns
+        the number of exported conversations.
+        """
+        path = Path(path)
+        _ensure_parent_dir(path)
+        count = 0
+        with _open_jsonl(path, "w") as f:
+            for record in self.iter_conversations(since=since, until=until, ids=ids):
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+                count += 1
+        return count
+
+    def import_(
+        self,
+        path: Union[str, Path],
+        *,
+        since: DateLike = None,
+        until: DateLike = None,
+        ids: Optional[Sequence[str]] = None,
+        batch_size: int = 500,
+    ) -> int:
+        """
+        Load conversations from a JSONL file written by `export`.
+
+        Records are inserted in transactions of `batch_size` rows. An existing
+        conversation is only replaced by a record with a newer or equal
+        `updated_at`. Returns the number of records read after filtering.
+        """
+        since_iso, until_iso = _iso_bound(since), _iso_bound(until, end=True)
+        wanted = set(ids) if ids is not None else None
+
+        def rows() -> Iterator[tuple]:
+            for record in iter_jsonl(path):
+                updated_at = str(record["updated_at"])
+                if since_iso is not None and updated_at < since_iso:
+                    continue
+                if until_iso is not None and updated_at > until_iso:
+                    continue
+                if wanted is not None and record["id"] not in wanted:
+                    continue
+                yield (
+                    str(record["id"]),
+                    str(record.get("title") or "Conversation"),
+                    str(record.get("created_at") or updated_at),
+                    updated_at,
+                    json.dumps(
+                        record.get("messages") or [],
+                        ensure_ascii=False,
+                        separators=(",", ":"),
+                    ),
+                )
+
+        count = 0
+        conn = self._connect()
+        try:
+            for batch in _batched(rows(), batch_size):
+                with conn:
+                    conn.executemany(
+                        """
+                        INSERT INTO conversations (id, title, created_at, updated_at, messages_json)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET
+                            title=excluded.title,
+                            updated_at=excluded.updated_at,
+                            messages_json=excluded.messages_json
+                        WHERE excluded.updated_at >= conversations.updated_at
+                        """,
+                        batch,
+                    )
+                    # Readers that fall behind a bulk import reload instead.
+                    _prune_changes(conn)
+                count += len(batch)
+        finally:
+            conn.close()
+        self._dispatch_changes()
+        return count
 
     def load_messages(self, *, id: str) -> List[Dict[str, Any]]:
         with self._connect() as conn:
@@ -110,8 +476,321 @@ class HistoryStore:
 
     def delete(self, *, id: str) -> None:
         with self._connect() as conn:
+            self._keep_held_transcripts(conn, [id])
             conn.execute("DELETE FROM conversations WHERE id = ?", (id,))
+            conn.execute("DELETE FROM checkpoint_log WHERE id = ?", (id,))
+        self._dispatch_changes()
 
     def clear(self) -> None:
         with self._connect() as conn:
+            self._keep_held_transcripts(conn, None)
             conn.execute("DELETE FROM conversations")
+            conn.execute("DELETE FROM checkpoint_log")
+        self._dispatch_changes()
+
+    # Change notifications. Subscribers get a list of changes:
+    # {"op": "upsert", "item": HistoryItem dict}, {"op": "delete", "id": ...}
+    # or a single {"op": "reload"} when too much changed to push row by row.
+
+    def subscribe(
+        self, callback: Callable[[List[HistoryChange]], None]
+    ) -> Callable[[], None]:
+        """
+        Call `callback` with the changed conversations after every write.
+
+        Bound methods are held weakly, so a subscribed widget can still be
+        garbage collected. Returns a function that unsubscribes.
+        """
+        if not self._subscribers:
+            self._change_seq = self._max_change_seq()
+        if inspect.ismethod(callback):
+            ref: Callable[[], Any] = weakref.WeakMethod(callback)  # type: ignore[arg-type]
+        else:
+
+            def ref() -> Any:
+                return callback
+
+        self._subscribers.append(ref)
+
+        def unsubscribe() -> None:
+            if ref in self._subscribers:
+                self._subscribers.remove(ref)
+
+        return unsubscribe
+
+    def poll(self) -> bool:
+        """
+        Publish changes committed by other processes since the last poll.
+
+        `PRAGMA data_version` on a long-lived connection only changes when
+        another connection commits, so an idle poll is a single cheap query.
+        """
+        if self._watch_conn is None:
+            self._watch_conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        version = self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return False
+        self._data_version = version
+        self._dispatch_changes()
+        return True
+
+    def start_polling(self, interval: float = 1.0) -> None:
+        """Poll in the background on the running event loop while subscribed."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = loop.create_task(self._poll_forever(interval))
+
+    async def _poll_forever(self, interval: float) -> None:
+        while self._subscribers:
+            await asyncio.sleep(interval)
+            self.poll()
+
+    def _max_change_seq(self) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(seq) AS seq FROM history_changes").fetchone()
+        return int(row["seq"] or 0)
+
+    def _dispatch_changes(self) -> None:
+        if not self._subscribers:
+            return
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, id FROM history_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self._change_seq, _MAX_PUSHED_CHANGES + 1),
+            ).fetchall()
+            if not rows:
+                return
+            oldest = conn.execute(
+                "SELECT MIN(seq) AS seq FROM history_changes"
+            ).fetchone()["seq"]
+            ids = list(dict.fromkeys(r["id"] for r in rows))
+            if len(rows) > _MAX_PUSHED_CHANGES or oldest > self._change_seq + 1:
+                # Too many changes, or some were pruned before we saw them.
+                self._change_seq = self._max_change_seq()
+                changes: List[HistoryChange] = [{"op": "reload"}]
+            else:
+                self._change_seq = int(rows[-1]["seq"])
+                found = {
+                    r["id"]: HistoryItem(**dict(r))
+                    for r in conn.execute(
+                        f"""
+                        SELECT id, title, created_at, updated_at
+                        FROM conversations
+                        WHERE id IN ({", ".join("?" for _ in ids)})
+                        """,
+                        ids,
+                    ).fetchall()
+                }
+                changes = []
+                for i in ids:
+                    if i in found:
+                        changes.append({"op": "upsert", "item": found[i].to_dict()})
+                    else:
+                        changes.append({"op": "delete", "id": i})
+            _prune_changes(conn)
+        for ref in list(self._subscribers):
+            callback = ref()
+            if callback is None:
+                self._subscribers.remove(ref)
+            else:
+                callback(changes)
+
+    # Messages evicted from a widget's in-memory transcript window. `seq` is
+    # the absolute position in the transcript, so re-spilling is idempotent.
+    # Positions without a spill row are read from the saved conversation, so
+    # widgets only spill messages that were not saved yet. Spill rows belong
+    # to the widget that wrote them: deleting conversations leaves them alone,
+    # and first copies the saved messages that open transcripts still rely on.
+
+    def hold_transcript(self, holder: Callable[[], Optional[Tuple[str, int]]]) -> None:
+        """
+        Register `holder`, which returns the conversation id and the number of
+        leading transcript positions read from its saved conversation (or
+        None). Held like subscribers, so a widget can be garbage collected.
+        """
+        if inspect.ismethod(holder):
+            self._holders.append(weakref.WeakMethod(holder))  # type: ignore[arg-type]
+        else:
+            self._holders.append(lambda: holder)
+
+    def _keep_held_transcripts(
+        self, conn: sqlite3.Connection, ids: Optional[List[str]]
+    ) -> None:
+        for ref in list(self._holders):
+            holder = ref()
+            if holder is None:
+                self._holders.remove(ref)
+                continue
+            held = holder()
+            if held is not None and (ids is None or held[0] in ids):
+                conn.execute(_HOLD_SAVED_SQL, {"id": held[0], "stop": int(held[1])})
+
+    def spill_messages(
+        self, *, id: str, start_seq: int, messages: List[Dict[str, Any]]
+    ) -> None:
+        rows = [
+            (
+                id,
+                start_seq + i,
+                str(m.get("role") or ""),
+                json.dumps(m, ensure_ascii=False, separators=(",", ":")),
+            )
+            for i, m in enumerate(messages)
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO transcript_spill
+                    (conversation_id, seq, role, message_json)
+                VALUES (?, ?, ?, ?)
+                """,
+                rows,
+            )
+
+    def load_spilled(self, *, id: str, start: int, stop: int) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT message_json FROM ({_SPILLED_SQL}) ORDER BY seq",
+                {"id": id, "start": int(start), "stop": int(stop)},
+            ).fetchall()
+        if len(rows) != stop - start:
+            raise KeyError(f"Spilled messages missing: {id}")
+        return [json.loads(r["message_json"]) for r in rows]
+
+    def iter_spilled(
+        self, *, id: str, stop: int, batch_size: int = 500
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the spilled messages at positions `0..stop`. The saved
+        conversation is read once and decoded item by item; spill rows are
+        read in short pages, so no read stays open across yields.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT messages_json FROM conversations WHERE id = ?", (id,)
+            ).fetchone()
+        saved = _iter_json_array(row["messages_json"]) if row is not None else iter(())
+        seq = 0
+        while seq < stop:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT seq, message_json FROM transcript_spill
+                    WHERE conversation_id = ? AND seq >= ? AND seq < ?
+                    ORDER BY seq
+                    LIMIT ?
+                    """,
+                    (id, seq, stop, batch_size),
+                ).fetchall()
+            spilled = {r["seq"]: r["message_json"] for r in rows}
+            page_stop = rows[-1]["seq"] + 1 if len(rows) == batch_size else stop
+            for seq in range(seq, page_stop):
+                # Positions with a spill row shadow the saved message.
+                message = next(saved, None)
+                if seq in spilled:
+                    message = json.loads(spilled[seq])
+                elif message is None:
+                    raise KeyError(f"Spilled messages missing: {id}")
+                yield message
+            seq = page_stop
+
+    def last_spilled_seq(self, *, id: str, before: int, role: str) -> Optional[int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT MAX(seq) AS seq FROM ({_SPILLED_SQL}) WHERE role = :role",
+                {"id": id, "start": 0, "stop": int(before), "role": role},
+            ).fetchone()
+        return None if row["seq"] is None else int(row["seq"])
+
+    def delete_spilled(self, *, id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM transcript_spill WHERE conversation_id = ?", (id,)
+            )
+
+    # Step-level run checkpoints, keyed by conversation id, stored as an
+    # append-only log so each step only writes what changed. `state` is the
+    # delta of a runtime `checkpoint` event; `messages` are the widget
+    # transcript messages added since the previous entry, starting at the
+    # absolute position `transcript_start`.
+
+    def append_checkpoint(
+        self,
+        *,
+        id: str,
+        updated_at: str,
+        state: Dict[str, Any],
+        transcript_start: int,
+        messages: List[Dict[str, Any]],
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO checkpoint_log
+                    (id, updated_at, state_json, transcript_start, messages_json)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    id,
+                    updated_at,
+                    json.dumps(state, ensure_ascii=False, separators=(",", ":")),
+                    int(transcript_start),
+                    json.dumps(messages, ensure_ascii=False, separators=(",", ":")),
+                ),
+            )
+
+    def load_checkpoint(self, *, id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fold the log of `id` into the latest checkpoint: the runtime state and
+        the transcript from its `transcript_offset` on. None if there is none.
+        """
+        from .runtime.base import merge_checkpoint
+
+        state: Optional[Dict[str, Any]] = None
+        transcript: Dict[int, Dict[str, Any]] = {}
+        updated_at = None
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT updated_at, state_json, transcript_start, messages_json
+                FROM checkpoint_log
+                WHERE id = ?
+                ORDER BY seq
+                """,
+                (id,),
+            )
+            for row in rows:
+                updated_at = row["updated_at"]
+                state = merge_checkpoint(state, json.loads(row["state_json"]))
+                messages = json.loads(row["messages_json"])
+                transcript.update(enumerate(messages, row["transcript_start"]))
+        if state is None:
+            return None
+        offset = int(state.get("transcript_offset") or 0)
+        return {
+            "id": id,
+            "updated_at": updated_at,
+            "state": state,
+            "messages": [transcript[i] for i in sorted(transcript) if i >= offset],
+        }
+
+    def list_checkpoints(self, *, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, MAX(updated_at) AS updated_at
+                FROM checkpoint_log
+                GROUP BY id
+                ORDER BY updated_at DESC
+                LIMIT ?
+                """,
+                (int(limit),),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def delete_checkpoint(self, *, id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM checkpoint_log WHERE id = ?", (id,))
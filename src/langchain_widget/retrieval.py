@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def chunk_text(text: str, *, chunk_words: int = 200) -> List[str]:
+    """Split text into chunks of roughly `chunk_words` words on paragraph boundaries."""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        words = paragraph.split()
+        if len(words) > chunk_words:
+            # Very long paragraphs are split on word boundaries.
+            if current:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            while len(words) > chunk_words:
+                chunks.append(" ".join(words[:chunk_words]))
+                words = words[chunk_words:]
+            paragraph = " ".join(words)
+        if current and size + len(words) > chunk_words:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(words)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+@dataclass(frozen=True)
+class _Chunk:
+    item_id: str
+    title: str
+    content: str
+    terms: Tuple[str, ...]
+    length: int
+
+
+class ContextIndex:
+    """
+    Incremental BM25 index over chunked context items (local, no network).
+
+    Items are re-chunked only when their title or content changes, so keeping
+    the index in sync with `context_items` is cheap between model calls.
+    """
+
+    def __init__(self, *, chunk_words: int = 200, k1: float = 1.5, b: float = 0.75):
+        self._chunk_words = chunk_words
+        self._k1 = k1
+        self._b = b
+        self._items: Dict[str, Tuple[str, str]] = {}
+        self._item_chunks: Dict[str, List[str]] = {}
+        self._chunks: Dict[str, _Chunk] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def upsert(self, *, id: str, title: str, content: str) -> None:
+        # Untitled items are labelled by their id, so the prompt can cite them.
+        title = title or id
+        if self._items.get(id) == (title, content):
+            return
+        self.remove(id)
+        self._items[id] = (title, content)
+        chunk_ids: List[str] = []
+        for n, text in enumerate(chunk_text(content, chunk_words=self._chunk_words)):
+            chunk_id = f"{id}#{n}"
+            tf = Counter(_tokenize(title) + _tokenize(text))
+            for term, count in tf.items():
+                self._postings.setdefault(term, {})[chunk_id] = count
+            length = sum(tf.values())
+            self._chunks[chunk_id] = _Chunk(id, title, text, tuple(tf), length)
+            self._total_length += length
+            chunk_ids.append(chunk_id)
+        self._item_chunks[id] = chunk_ids
+
+    def remove(self, id: str) -> None:
+        self._items.pop(id, None)
+        for chunk_id in self._item_chunks.pop(id, []):
+            chunk = self._chunks.pop(chunk_id)
+            self._total_length -= chunk.length
+            for term in chunk.terms:
+                postings = self._postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self._postings[term]
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._item_chunks.clear()
+        self._chunks.clear()
+        self._postings.clear()
+        self._total_length = 0
+
+    def sync(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Bring the index in line with a full `context_items` list."""
+        seen = set()
+        for position, item in enumerate(items):
+            # Items without an id are keyed by position so none overwrite another.
+            item_id = str(item.get("id") or f"#{position}")
+            seen.add(item_id)
+            self.upsert(
+                id=item_id,
+                title=str(item.get("title") or ""),
+                content=str(item.get("content") or ""),
+            )
+        for item_id in [i for i in self._items if i not in seen]:
+            self.remove(item_id)
+
+    def _scores(self, query: str) -> Dict[str, float]:
+        n = len(self._chunks)
+        avg_length = self._total_length / n if n else 0.0
+        scores: Dict[str, float] = {}
+        for term in set(_tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1.0 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                length = self._chunks[chunk_id].length
+                norm = 1.0 - self._b + self._b * length / (avg_length or 1.0)
+                score = idf * tf * (self._k1 + 1.0) / (tf + self._k1 * norm)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + score
+        return scores
+
+    def _ranked_chunks(self, query: str) -> List[str]:
+        scores = self._scores(query)
+        order = {chunk_id: i for i, chunk_id in enumerate(self._chunks)}
+        return sorted(scores, key=lambda c: (-scores[c], order[c]))
+
+    def search(self, query: str, *, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Return the top-k chunks for `query` as context-item dicts.
+
+        When the whole index fits in `k` chunks every chunk is returned in
+        insertion order, so small contexts are never dropped. A query that
+        matches no chunk falls back to the first `k` chunks.
+        """
+        ranked = self._ranked_chunks(query)[:k]
+        if len(self._chunks) <= k or not ranked:
+            ranked = list(self._chunks)[:k]
+        return [self._chunk_dict(c) for c in ranked]
+
+    def rank_items(self, query: str, *, k: int = 5) -> List[str]:
+        """Return the ids of the top-k items for `query`, ranked by their best chunk."""
+        if len(self._items) <= k:
+            return list(self._items)
+        ids: List[str] = []
+        for chunk_id in self._ranked_chunks(query):
+            item_id = self._chunks[chunk_id].item_id
+            if item_id not in ids:
+                ids.append(item_id)
+                if len(ids) == k:
+                    break
+        return ids
+
+    def _chunk_dict(self, chunk_id: str) -> Dict[str, Any]:
+        chunk = self._chunks[chunk_id]
+        return {"id": chunk_id, "title": chunk.title, "content": chunk.content}
+
+
+def latest_user_text(messages: List[Dict[str, Any]]) -> str:
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            return str(m.get("content") or "")
+    return ""
@@ -1,3 +1,28 @@
-from .langchain_runtime import LangChainToolCallingRuntime
+from __future__ import annotations
 
-__all__ = ["LangChainToolCallingRuntime"]
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .langchain_runtime import LangChainToolCallingRuntime
+    from .resilience import ResiliencePolicy
+
+__all__ = ["LangChainToolCallingRuntime", "ResiliencePolicy"]
+
+_LAZY_ATTRS = {
+    "LangChainToolCallingRuntime": ".langchain_runtime",
+    "ResiliencePolicy": ".resilience",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Protocol
+from typing import Any, Dict, List, Optional, Protocol
 
 
 @dataclass(frozen=True)
@@ -11,6 +11,25 @@ class ToolCall:
     args: Dict[str, Any]
 
 
+def merge_checkpoint(
+    state: Optional[Dict[str, Any]], delta: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Apply the delta of a `checkpoint` event to the state folded so far.
+
+    `messages` replace everything after position `base`; new messages start a
+    new step, whose `tool_results` start empty. Other keys are replaced.
+    """
+    state = dict(state or {})
+    messages = list(state.get("messages") or [])[: int(delta.get("base") or 0)]
+    messages.extend(delta.get("messages") or [])
+    results = {} if delta.get("messages") else dict(state.get("tool_results") or {})
+    results.update(delta.get("tool_results") or {})
+    state.update(delta, messages=messages, tool_results=results)
+    state.pop("base", None)
+    return state
+
+
 class AgentRuntime(Protocol):
     async def run(
         self,
@@ -2,12 +2,43 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
 
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
-from langchain_core.tools import BaseTool
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+    message_chunk_to_message,
+    messages_from_dict,
+    messages_to_dict,
+)
 
+from ..retrieval import ContextIndex, latest_user_text
+from ..tools import ToolRouter
 from .base import ToolCall
+from .prompt import (
+    assemble_prompt,
+    attach_context,
+    cache_usage,
+    supports_cache_breakpoints,
+    with_cache_breakpoints,
+)
+from .resilience import ResiliencePolicy, invoke_with_resilience
+
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
 
 
 EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
@@ -58,6 +89,55 @@ def _lc_messages_from_transcript(
     return messages
 
 
+def _completed_tool_calls(
+    message: Any,
+    *,
+    indexes: Optional[Collection[Any]] = None,
+    skip: Collection[str] = (),
+) -> List[ToolCall]:
+    """Tool calls in a partially streamed message whose arguments are complete.
+
+    A call is complete once its accumulated argument string parses as a JSON
+    object: a closed object cannot be extended by later chunks. Only calls at
+    `indexes` (all when None) are checked, and ids in `skip` are not parsed.
+    """
+    completed: List[ToolCall] = []
+    for chunk in getattr(message, "tool_call_chunks", None) or []:
+        if indexes is not None and chunk.get("index") not in indexes:
+            continue
+        call_id = chunk.get("id")
+        name = chunk.get("name")
+        if not call_id or not name or call_id in skip:
+            continue
+        try:
+            args = json.loads(chunk.get("args") or "")
+        except ValueError:
+            continue
+        if isinstance(args, dict):
+            completed.append(ToolCall(id=call_id, name=name, args=args))
+    return completed
+
+
+def _adopt_tool_task(
+    carried: List[Tuple[ToolCall, "asyncio.Task[str]"]], call: ToolCall
+) -> Optional["asyncio.Task[str]"]:
+    """
+    Take the task a failed attempt started for `call`, if any.
+
+    Providers assign new call ids on a retry, so a call with the same name
+    and arguments also matches; each task is handed out once.
+    """
+    for match in (
+        lambda earlier: earlier.id == call.id,
+        lambda earlier: earlier.name == call.name and earlier.args == call.args,
+    ):
+        for i, (earlier, task) in enumerate(carried):
+            if match(earlier):
+                del carried[i]
+                return task
+    return None
+
+
 class LangChainToolCallingRuntime:
     def __init__(
         self,
@@ -66,21 +146,82 @@ class LangChainToolCallingRuntime:
         tools: Optional[List[BaseTool]] = None,
         system_prompt: Optional[str] = None,
         max_steps: int = 8,
+        eager_tool_execution: bool = False,
+        context_top_k: Optional[int] = None,
+        context_index: Optional[ContextIndex] = None,
+        tool_router: Optional[ToolRouter] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        fallback_models: Optional[List[Any]] = None,
+        cache_breakpoints: Optional[bool] = None,
+        checkpoints: bool = False,
     ) -> None:
         self._chat_model = chat_model
         self._tools = tools or []
         self._system_prompt = system_prompt
         self._max_steps = max_steps
+        self._eager_tool_execution = eager_tool_execution
+        self._context_top_k = context_top_k
+        self._context_index = context_index
+        self._tool_router = tool_router
+        self._resilience = resilience
+        self._fallback_models = list(fallback_models or [])
+        self._cache_breakpoints = cache_breakpoints
+        self._checkpoints = checkpoints
 
-    def _bind_tools(self) -> Any:
+    def _uses_cache_breakpoints(self, chat_model: Any) -> bool:
+        """Whether to mark cache breakpoints for this (primary or fallback) model."""
+        if self._cache_breakpoints is None:
+            return supports_cache_breakpoints(chat_model)
+        return self._cache_breakpoints
+
+    def _bind_tools(
+        self, query: str = "", chat_model: Any = None, keep: Iterable[str] = ()
+    ) -> Any:
+        chat_model = self._chat_model if chat_model is None else chat_model
         if not self._tools:
-            return self._chat_model
-        binder = getattr(self._chat_model, "bind_tools", None)
+            return chat_model
+        binder = getattr(chat_model, "bind_tools", None)
         if binder is None:
             raise TypeError(
                 "chat_model does not support tool calling (missing bind_tools)."
             )
-        return binder(self._tools)
+        if self._tool_router is None:
+            return binder(self._tools)
+        # A cached prompt prefix starts with the tool definitions, so keep
+        # the bound subset stable for models that cache it.
+        tools = self._tool_router.select(
+            self._tools,
+            query,
+            keep=keep,
+            sticky=self._uses_cache_breakpoints(chat_model),
+        )
+        if not tools:
+            return chat_model
+        return self._tool_router.bound_model(chat_model, tools, binder)
+
+    def _step_models(self, query: str, lc_messages: List[Any]) -> List[Tuple[Any, Any]]:
+        """
+        Bind tools to the primary and fallback models for the next call;
+        returns `(chat_model, bound_model)` pairs.
+
+        With a router, later steps route on the user query plus the tool
+        results of the current turn, and keep the tools called so far bound.
+        """
+        keep: List[str] = []
+        if self._tool_router is not None:
+            results: List[str] = []
+            for m in reversed(lc_messages):
+                if isinstance(m, HumanMessage):
+                    break
+                if isinstance(m, ToolMessage):
+                    results.append(str(m.content))
+                elif isinstance(m, AIMessage):
+                    keep.extend(tc["name"] for tc in m.tool_calls or [])
+            query = "\n".join([query, *reversed(results)])
+        return [
+            (chat_model, self._bind_tools(query, chat_model, keep))
+            for chat_model in [self._chat_model, *self._fallback_models]
+        ]
 
     def _tool_map(self) -> Dict[str, BaseTool]:
         return {t.name: t for t in self._tools}
@@ -100,6 +241,135 @@ class LangChainToolCallingRuntime:
             return await asyncio.to_thread(tool.run, **args)
         raise TypeError(f"Tool {tool.name!r} is not invokable.")
 
+    async def _execute_tool_call(
+        self, tool_map: Dict[str, BaseTool], call: ToolCall
+    ) -> str:
+        tool = tool_map.get(call.name)
+        if tool is None:
+            result = f"Unknown tool: {call.name}"
+        else:
+            try:
+                result = await self._run_tool(tool, call.args)
+            except Exception as e:
+                result = f"Tool error: {type(e).__name__}: {e}"
+        return _json_dumps(result)
+
+    async def _stream_with_eager_tools(
+        self,
+        model: Any,
+        lc_messages: List[Any],
+        tool_map: Dict[str, BaseTool],
+        carried: Optional[List[Tuple[ToolCall, "asyncio.Task[str]"]]] = None,
+    ) -> Tuple[AIMessage, Dict[str, "asyncio.Task[str]"]]:
+        """
+        Stream the model response and start each tool call as soon as its
+        arguments are complete, overlapping tool latency with generation.
+
+        Returns the final message and the already started tool tasks keyed by
+        tool call id; the caller awaits them in tool call order. With
+        `carried`, tasks of a failed earlier attempt are reused for matching
+        calls, and this attempt's tasks are handed over there if it fails.
+        """
+        started: Dict[str, asyncio.Task[str]] = {}
+        calls: Dict[str, ToolCall] = {}
+        acc: Any = None
+        try:
+            async for chunk in model.astream(lc_messages):
+                acc = chunk if acc is None else acc + chunk
+                # Only the calls this chunk extended can have completed.
+                indexes = {
+                    c.get("index")
+                    for c in getattr(chunk, "tool_call_chunks", None) or []
+                }
+                if not indexes:
+                    continue
+                for call in _completed_tool_calls(
+                    acc, indexes=None if None in indexes else indexes, skip=started
+                ):
+                    task = None if carried is None else _adopt_tool_task(carried, call)
+                    calls[call.id] = call
+                    started[call.id] = task or asyncio.ensure_future(
+                        self._execute_tool_call(tool_map, call)
+                    )
+        except BaseException:
+            if carried is None:
+                for task in started.values():
+                    task.cancel()
+            else:
+                carried.extend((calls[i], task) for i, task in started.items())
+            raise
+
+        if acc is None:
+            return AIMessage(content=""), started
+        return message_chunk_to_message(acc), started
+
+    async def _invoke_model(
+        self,
+        models: List[Tuple[Any, Any]],
+        lc_messages: List[Any],
+        tool_map: Dict[str, BaseTool],
+        on_event: EventCallback,
+    ) -> Tuple[AIMessage, Dict[str, "asyncio.Task[str]"]]:
+        # Tools started by a failed eager attempt already ran (or are
+        # running); retries and fallbacks reuse them instead of running the
+        # tools again.
+        carried: List[Tuple[ToolCall, asyncio.Task[str]]] = []
+
+        async def call(
+            models: Tuple[Any, Any],
+        ) -> Tuple[AIMessage, Dict[str, asyncio.Task[str]]]:
+            chat_model, model = models
+            messages = lc_messages
+            if self._uses_cache_breakpoints(chat_model):
+                messages = with_cache_breakpoints(lc_messages)
+            if self._eager_tool_execution and callable(getattr(model, "astream", None)):
+                return await self._stream_with_eager_tools(
+                    model, messages, tool_map, carried
+                )
+            return await model.ainvoke(messages), {}
+
+        try:
+            if self._resilience is None and len(models) == 1:
+                ai, started = await call(models[0])
+            else:
+                ai, started = await invoke_with_resilience(
+                    models,
+                    call,
+                    policy=self._resilience or ResiliencePolicy(max_retries=0),
+                    on_event=on_event,
+                    # Hedged streams could both start the same tool calls.
+                    allow_hedge=not self._eager_tool_execution,
+                )
+            for tc in ai.tool_calls or []:
+                tool_call = ToolCall(
+                    id=tc.get("id") or "",
+                    name=tc.get("name") or "",
+                    args=tc.get("args") or {},
+                )
+                if carried and tool_call.id not in started:
+                    task = _adopt_tool_task(carried, tool_call)
+                    if task is not None:
+                        started[tool_call.id] = task
+            return ai, started
+        finally:
+            for _, task in carried:
+                task.cancel()
+
+    def _select_context(
+        self, messages: List[Dict[str, Any]], context_items: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Keep pinned items and the chunks relevant to the latest user turn."""
+        if self._context_top_k is None or not context_items:
+            return context_items
+        pinned = [c for c in context_items if c.get("pinned")]
+        candidates = [c for c in context_items if not c.get("pinned")]
+        if self._context_index is None:
+            self._context_index = ContextIndex()
+        self._context_index.sync(candidates)
+        return pinned + self._context_index.search(
+            latest_user_text(messages), k=self._context_top_k
+        )
+
     async def run(
         self,
         *,
@@ -114,73 +384,208 @@ class LangChainToolCallingRuntime:
             or ""
         ).strip()
 
-        if context_items:
-            context_blob = "\n\n".join(
-                f"[{c.get('title') or c.get('id') or 'context'}]\n{c.get('content','')}"
-                for c in context_items
-            )
-            system_prompt = (system_prompt + "\n\n" + context_blob).strip()
+        stable, volatile = assemble_prompt(
+            system_prompt, self._select_context(messages, context_items)
+        )
+        caching = self._uses_cache_breakpoints(self._chat_model)
+        has_turn = any(m.get("role") == "user" for m in messages)
+        if volatile and not (caching and has_turn):
+            # Without prompt caching all context stays in the system prompt.
+            stable, volatile = "\n\n".join(p for p in (stable, volatile) if p), ""
+        lc_messages = _lc_messages_from_transcript(messages, stable or None)
+        if volatile:
+            # After the history, so changing context keeps the history cached.
+            attach_context(lc_messages, volatile)
+        await self._run_steps(
+            lc_messages, query=latest_user_text(messages), on_event=on_event
+        )
 
-        lc_messages = _lc_messages_from_transcript(messages, system_prompt or None)
-        model = self._bind_tools()
+    async def resume(
+        self, *, checkpoint: Dict[str, Any], on_event: EventCallback
+    ) -> None:
+        """
+        Continue a run from a checkpoint.
+
+        `checkpoint` is the state folded from `checkpoint` events with
+        `merge_checkpoint`. Completed model calls and tool results are
+        replayed from it; only the remaining tool calls and steps run.
+        """
+        lc_messages = messages_from_dict(checkpoint.get("messages") or [])
+        await self._run_steps(
+            lc_messages,
+            query=checkpoint.get("query") or "",
+            on_event=on_event,
+            first_step=int(checkpoint.get("step") or 0),
+            tool_calls=list(checkpoint.get("tool_calls") or []),
+            tool_results=dict(checkpoint.get("tool_results") or {}),
+            emitted=len(lc_messages),
+        )
+
+    async def _checkpoint(
+        self,
+        on_event: EventCallback,
+        *,
+        step: int,
+        query: str,
+        lc_messages: List[Any],
+        emitted: int,
+        tool_calls: List[Dict[str, Any]],
+        tool_results: Dict[str, str],
+    ) -> int:
+        """
+        Emit the state change since the previous checkpoint (see
+        `merge_checkpoint`): the messages after the first `emitted` ones and
+        the new `tool_results`. Returns the number of messages emitted.
+        """
+        if not self._checkpoints:
+            return emitted
+        # Tool calls of the current step without a folded tool result are
+        # still pending; the messages end with their AIMessage.
+        await on_event(
+            {
+                "type": "checkpoint",
+                "state": {
+                    "step": step,
+                    "query": query,
+                    "base": emitted,
+                    "messages": messages_to_dict(lc_messages[emitted:]),
+                    "tool_calls": tool_calls,
+                    "tool_results": dict(tool_results),
+                },
+            }
+        )
+        return len(lc_messages)
+
+    async def _run_steps(
+        self,
+        lc_messages: List[Any],
+        *,
+        query: str,
+        on_event: EventCallback,
+        first_step: int = 0,
+        tool_calls: Optional[List[Dict[str, Any]]] = None,
+        tool_results: Optional[Dict[str, str]] = None,
+        emitted: int = 0,
+    ) -> None:
         tool_map = self._tool_map()
+        # Without a router the bound tools are the same for every step.
+        static_models = (
+            None if self._tool_router else self._step_models(query, lc_messages)
+        )
 
         await on_event({"type": "status", "status": "thinking"})
 
-        for step in range(self._max_steps):
-            ai: AIMessage = await model.ainvoke(lc_messages)
-            tool_calls = list(ai.tool_calls or [])
+        pending_calls = tool_calls or []
+        results = tool_results or {}
 
-            await on_event(
-                {
-                    "type": "assistant_message",
-                    "content": ai.content or "",
-                    "tool_calls": tool_calls,
-                }
-            )
+        for step in range(first_step, first_step + self._max_steps):
+            started: Dict[str, asyncio.Task[str]] = {}
+            resumed = bool(pending_calls)
+            if resumed:
+                # Resuming mid-step: the model call was already paid for.
+                step_calls, pending_calls = pending_calls, []
+            else:
+                ai, started = await self._invoke_model(
+                    static_models or self._step_models(query, lc_messages),
+                    lc_messages,
+                    tool_map,
+                    on_event,
+                )
+                step_calls = list(ai.tool_calls or [])
+                results = {}
+            try:
+                if not resumed:
+                    await on_event(
+                        {
+                            "type": "assistant_message",
+                            "content": ai.content or "",
+                            "tool_calls": step_calls,
+                        }
+                    )
+                    usage = cache_usage(ai)
+                    if usage is not None:
+                        await on_event({"type": "prompt_cache", **usage})
 
-            lc_messages.append(ai)
+                    lc_messages.append(ai)
 
-            if not tool_calls:
-                await on_event({"type": "status", "status": "idle"})
-                return
+                    if not step_calls:
+                        if self._checkpoints:
+                            await on_event({"type": "checkpoint", "state": None})
+                        await on_event({"type": "status", "status": "idle"})
+                        return
 
-            for tc in tool_calls:
-                call = ToolCall(
-                    id=tc.get("id") or "",
-                    name=tc.get("name") or "",
-                    args=tc.get("args") or {},
-                )
-                await on_event(
-                    {
-                        "type": "tool_start",
-                        "tool_call_id": call.id,
-                        "name": call.name,
-                        "args": call.args,
-                    }
-                )
+                    emitted = await self._checkpoint(
+                        on_event,
+                        step=step,
+                        query=query,
+                        lc_messages=lc_messages,
+                        emitted=emitted,
+                        tool_calls=step_calls,
+                        tool_results={},
+                    )
 
-                tool = tool_map.get(call.name)
-                if tool is None:
-                    result = f"Unknown tool: {call.name}"
-                else:
-                    try:
-                        result = await self._run_tool(tool, call.args)
-                    except Exception as e:
-                        result = f"Tool error: {type(e).__name__}: {e}"
-
-                tool_content = _json_dumps(result)
-                lc_messages.append(
-                    ToolMessage(content=tool_content, tool_call_id=call.id)
-                )
-                await on_event(
-                    {
-                        "type": "tool_end",
-                        "tool_call_id": call.id,
-                        "name": call.name,
-                        "content": tool_content,
-                    }
-                )
+                step_messages = list(lc_messages)
+                for tc in step_calls:
+                    call = ToolCall(
+                        id=tc.get("id") or "",
+                        name=tc.get("name") or "",
+                        args=tc.get("args") or {},
+                    )
+                    if call.id in results:
+                        lc_messages.append(
+                            ToolMessage(content=results[call.id], tool_call_id=call.id)
+                        )
+                        continue
+
+                    await on_event(
+                        {
+                            "type": "tool_start",
+                            "tool_call_id": call.id,
+                            "name": call.name,
+                            "args": call.args,
+                        }
+                    )
+
+                    task = started.pop(call.id, None)
+                    if task is not None:
+                        tool_content = await task
+                    else:
+                        tool_content = await self._execute_tool_call(tool_map, call)
+
+                    lc_messages.append(
+                        ToolMessage(content=tool_content, tool_call_id=call.id)
+                    )
+                    await on_event(
+                        {
+                            "type": "tool_end",
+                            "tool_call_id": call.id,
+                            "name": call.name,
+                            "content": tool_content,
+                        }
+                    )
+                    results[call.id] = tool_content
+                    emitted = await self._checkpoint(
+                        on_event,
+                        step=step,
+                        query=query,
+                        lc_messages=step_messages,
+                        emitted=emitted,
+                        tool_calls=step_calls,
+                        tool_results={call.id: tool_content},
+                    )
+            finally:
+                for task in started.values():
+                    task.cancel()
+
+            emitted = await self._checkpoint(
+                on_event,
+                step=step + 1,
+                query=query,
+                lc_messages=lc_messages,
+                emitted=emitted,
+                tool_calls=[],
+                tool_results={},
+            )
 
         await on_event(
             {
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _context_block(item: Dict[str, Any]) -> str:
+    return f"[{item.get('title') or item.get('id') or 'context'}]\n{item.get('content','')}"
+
+
+def _content_hash(item: Dict[str, Any]) -> str:
+    key = f"{item.get('title') or ''}\0{item.get('content') or ''}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def supports_cache_breakpoints(chat_model: Any) -> bool:
+    """Whether the model accepts `cache_control` markers on content blocks."""
+    llm_type = str(getattr(chat_model, "_llm_type", "") or "")
+    module = type(chat_model).__module__ or ""
+    return "anthropic" in llm_type or module.startswith("langchain_anthropic")
+
+
+def assemble_prompt(
+    system_prompt: str, context_items: List[Dict[str, Any]]
+) -> Tuple[str, str]:
+    """
+    Split the prompt into a stable system prefix and volatile context.
+
+    The prefix is the system prompt plus pinned context items ordered by
+    content hash, so it is byte-identical across calls as long as those
+    inputs are unchanged, whatever order they were added in. Unpinned items
+    (e.g. retrieved chunks) form the volatile part, in the given order; with
+    prompt caching it belongs after the conversation history so changing it
+    does not invalidate the cached history.
+    """
+    pinned = sorted((c for c in context_items if c.get("pinned")), key=_content_hash)
+    volatile = [c for c in context_items if not c.get("pinned")]
+    stable = "\n\n".join(
+        part for part in [system_prompt.strip(), *map(_context_block, pinned)] if part
+    )
+    return stable, "\n\n".join(_context_block(c) for c in volatile)
+
+
+def attach_context(messages: List[Any], context: str) -> None:
+    """Prepend volatile `context` to the latest human message (if any), in place."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            content = messages[i].content
+            if isinstance(content, str):
+                content = f"{context}\n\n{content}" if content else context
+            else:
+                content = [{"type": "text", "text": context}, *content]
+            messages[i] = messages[i].model_copy(update={"content": content})
+            return
+
+
+def _with_cache_control(message: Any) -> Any:
+    content = message.content
+    if isinstance(content, str):
+        if not content:
+            return message
+        blocks = [{"type": "text", "text": content, "cache_control": _CACHE_CONTROL}]
+    else:
+        blocks = list(content)
+        if not blocks or not isinstance(blocks[-1], dict):
+            return message
+        blocks[-1] = dict(blocks[-1], cache_control=_CACHE_CONTROL)
+    return message.model_copy(update={"content": blocks})
+
+
+def with_cache_breakpoints(messages: List[Any]) -> List[Any]:
+    """
+    Copy `messages` with `cache_control` markers (at most three) at the end of
+    the system prefix, of the history before the latest human turn, and of
+    the whole request. Earlier turns thus stay cached while the latest turn
+    and its context change, and later tool steps of a run reuse earlier ones.
+    """
+    marked = list(messages)
+    points = set()
+    if marked and isinstance(marked[0], SystemMessage):
+        points.add(0)
+    humans = [i for i, m in enumerate(marked) if isinstance(m, HumanMessage)]
+    if humans and humans[-1] > 0:
+        points.add(humans[-1] - 1)
+    if marked:
+        points.add(len(marked) - 1)
+    for i in points:
+        marked[i] = _with_cache_control(marked[i])
+    return marked
+
+
+def cache_usage(message: Any) -> Optional[Dict[str, Any]]:
+    """
+    Prompt-cache token counts from a model response, if the provider reports
+    them: `input_tokens`, `cache_read`, `cache_creation` and `hit_ratio`.
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    cache_read = details.get("cache_read")
+    cache_creation = details.get("cache_creation")
+    input_tokens = usage.get("input_tokens")
+
+    if cache_read is None and cache_creation is None:
+        # Fall back to raw provider payloads.
+        metadata = getattr(message, "response_metadata", None) or {}
+        raw = metadata.get("usage") or {}
+        if "cache_read_input_tokens" in raw:  # Anthropic
+            cache_read = raw.get("cache_read_input_tokens") or 0
+            cache_creation = raw.get("cache_creation_input_tokens") or 0
+            input_tokens = (raw.get("input_tokens") or 0) + cache_read + cache_creation
+        token_usage = metadata.get("token_usage") or {}
+        prompt_details = token_usage.get("prompt_tokens_details") or {}
+        if "cached_tokens" in prompt_details:  # OpenAI
+            cache_read = prompt_details.get("cached_tokens") or 0
+            input_tokens = token_usage.get("prompt_tokens")
+
+    if cache_read is None and cache_creation is None:
+        return None
+    cache_read = int(cache_read or 0)
+    cache_creation = int(cache_creation or 0)
+    input_tokens = int(input_tokens or 0)
+    return {
+        "input_tokens": input_tokens,
+        "cache_read": cache_read,
+        "cache_creation": cache_creation,
+        "hit_ratio": cache_read / input_tokens if input_tokens else 0.0,
+    }
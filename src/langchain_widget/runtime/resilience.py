@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ResiliencePolicy:
+    """
+    Retries, deadlines, hedging and fallbacks for model calls.
+
+    - Failed or timed-out calls are retried `max_retries` times with full-jitter
+      exponential backoff (`backoff_base * 2**attempt`, capped at `backoff_max`).
+    - `timeout` is a per-call deadline in seconds.
+    - With `hedge=True` a second identical request is fired when the first one
+      is slower than the `hedge_quantile` of recent latencies, and the first
+      successful response wins. Until `hedge_min_samples` calls have been
+      observed, `hedge_delay` is used instead (no hedging if it is None).
+
+    The policy keeps a window of recent latencies, so reuse one instance
+    across runs to let the hedge delay adapt.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        timeout: Optional[float] = None,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_delay: Optional[float] = None,
+        latency_window: int = 200,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.default_hedge_delay = hedge_delay
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+
+    def record_latency(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        if len(self._latencies) < self.hedge_min_samples:
+            return self.default_hedge_delay
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))
+        return ordered[index]
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(
+            0.0, min(self.backoff_max, self.backoff_base * 2**attempt)
+        )
+
+
+def _describe(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+async def _with_deadline(call: Awaitable[Any], timeout: Optional[float]) -> Any:
+    if timeout is None:
+        return await call
+    return await asyncio.wait_for(call, timeout)
+
+
+async def _hedged(
+    start: Callable[[], Awaitable[Any]],
+    timeout: Optional[float],
+    delay: float,
+    on_hedge: Callable[[], Awaitable[None]],
+) -> Tuple[Any, bool]:
+    primary = asyncio.ensure_future(_with_deadline(start(), timeout))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return primary.result(), False
+
+        await on_hedge()
+        tasks.append(asyncio.ensure_future(_with_deadline(start(), timeout)))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), task is not primary
+                error = task.exception()
+        assert error is not None
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def invoke_with_resilience(
+    models: List[Any],
+    call: Callable[[Any], Awaitable[Any]],
+    *,
+    policy: ResiliencePolicy,
+    on_event: EventCallback,
+    allow_hedge: bool = True,
+) -> Any:
+    """
+    Run `call(model)` against `models` in order until one succeeds.
+
+    Emits `model_retry`, `model_hedge`, `model_fallback` and `model_call`
+    events; re-raises the last error once every model is exhausted.
+    """
+    loop = asyncio.get_running_loop()
+    last_error: Optional[BaseException] = None
+    for index, model in enumerate(models):
+        if index:
+            await on_event(
+                {
+                    "type": "model_fallback",
+                    "model_index": index,
+                    "error": _describe(last_error) if last_error else "",
+                }
+            )
+        for attempt in range(policy.max_retries + 1):
+            delay = policy.hedge_delay() if allow_hedge else None
+            started_at = loop.time()
+            try:
+                if delay is None:
+                    result = await _with_deadline(call(model), policy.timeout)
+                    hedge_won = False
+                else:
+                    result, hedge_won = await _hedged(
+                        functools.partial(call, model),
+                        policy.timeout,
+                        delay,
+                        functools.partial(
+                            on_event,
+                            {
+                                "type": "model_hedge",
+                                "model_index": index,
+                                "delay": delay,
+                            },
+                        ),
+                    )
+            except Exception as e:
+                last_error = e
+                if attempt < policy.max_retries:
+                    backoff = policy.backoff(attempt)
+                    await on_event(
+                        {
+                            "type": "model_retry",
+                            "model_index": index,
+                            "attempt": attempt + 1,
+                            "delay": backoff,
+                            "error": _describe(e),
+                        }
+                    )
+                    await asyncio.sleep(backoff)
+                continue
+
+            latency = loop.time() - started_at
+            policy.record_latency(latency)
+            await on_event(
+                {
+                    "type": "model_call",
+                    "model_index": index,
+                    "attempt": attempt,
+                    "latency": latency,
+                    "hedge_won": hedge_won,
+                }
+            )
+            return result
+
+    assert last_error is not None
+    raise last_error
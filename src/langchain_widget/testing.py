@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass
-from typing import Any, Iterable, List, Optional
+from typing import Any, AsyncIterator, Iterable, List, Optional
 
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.messages.tool import tool_call_chunk
 
 
 @dataclass(frozen=True)
@@ -25,7 +27,8 @@ class TestChatModel:
     Minimal async chat model for tests/examples (no API keys, no network).
 
     This is intentionally tiny: it only implements the subset used by
-    `LangChainToolCallingRuntime` (`bind_tools` + `ainvoke` returning `AIMessage`).
+    `LangChainToolCallingRuntime` (`bind_tools` + `ainvoke` returning `AIMessage`,
+    and `astream` yielding the same message as `AIMessageChunk`s).
     """
 
     def __init__(self, script: Iterable[AIMessage]) -> None:
@@ -47,3 +50,28 @@ class TestChatModel:
         msg = self._script[self._index]
         self._index += 1
         return msg
+
+    async def astream(self, messages: Any) -> AsyncIterator[AIMessageChunk]:
+        msg = await self.ainvoke(messages)
+        yield AIMessageChunk(content=msg.content)
+        for index, tc in enumerate(msg.tool_calls or []):
+            # Split the arguments so consumers see partial JSON first.
+            args = json.dumps(tc.get("args") or {})
+            half = len(args) // 2
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    tool_call_chunk(
+                        name=tc.get("name"),
+                        args=args[:half],
+                        id=tc.get("id"),
+                        index=index,
+                    )
+                ],
+            )
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    tool_call_chunk(name=None, args=args[half:], id=None, index=index)
+                ],
+            )
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import sys
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-from langchain_core.tools import BaseTool
+from .retrieval import ContextIndex
+
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
 
 
 def tool_manifest(tool: BaseTool) -> Dict[str, Any]:
@@ -22,3 +27,133 @@ def tool_manifest(tool: BaseTool) -> Dict[str, Any]:
         "description": getattr(tool, "description", "") or "",
         "schema": schema,
     }
+
+
+# Bound models kept per (chat model, tool subset); the least recently used
+# binding is dropped beyond this.
+_BOUND_CACHE_SIZE = 32
+
+
+def _manifest_text(manifest: Dict[str, Any]) -> str:
+    name = manifest["name"]
+    parts = [name, name.replace("_", " ").replace("-", " "), manifest["description"]]
+    properties = (manifest.get("schema") or {}).get("properties") or {}
+    for arg_name, prop in properties.items():
+        parts.append(arg_name.replace("_", " "))
+        if isinstance(prop, dict) and prop.get("description"):
+            parts.append(str(prop["description"]))
+    # Joined without blank lines so each tool is indexed as a single chunk.
+    return "\n".join(parts)
+
+
+class ToolRouter:
+    """
+    Pick the tools relevant to a turn from a large tool registry.
+
+    Tools are indexed by name, description and argument schema; each model
+    call binds the pinned tools plus the top-k matches for the routing query,
+    filled up in registry order when fewer than k tools match. Bound models
+    are cached per tool subset (a small LRU), so repeated subsets skip
+    `bind_tools`.
+
+    For models with prompt caching, `select(..., sticky=True)` keeps the
+    subset stable instead: pinned tools first, then the others in the order
+    they were first selected, so the tool definitions at the head of the
+    prompt stay a cacheable prefix. Beyond top-k unpinned tools, the least
+    recently selected one is dropped.
+    """
+
+    def __init__(self, *, top_k: int = 8, pinned: Iterable[str] = ()) -> None:
+        self.top_k = top_k
+        self.pinned = list(pinned)
+        self._index = ContextIndex(chunk_words=sys.maxsize)
+        self._indexed: Dict[str, BaseTool] = {}
+        # Sticky tool name -> select() call that last chose it, in bind order.
+        self._sticky: Dict[str, int] = {}
+        self._selects = 0
+        self._bound: OrderedDict[Tuple[int, Tuple[str, ...]], Tuple[Any, Any]] = (
+            OrderedDict()
+        )
+
+    def sync(self, tools: Iterable[BaseTool]) -> None:
+        current = {t.name: t for t in tools}
+        for name in [n for n in self._indexed if n not in current]:
+            del self._indexed[name]
+            self._index.remove(name)
+            self._sticky.pop(name, None)
+            self._bound.clear()
+        for name, tool in current.items():
+            if self._indexed.get(name) is tool:
+                continue
+            if name in self._indexed:
+                # A replaced tool invalidates every binding that included it.
+                self._bound.clear()
+            self._indexed[name] = tool
+            self._index.upsert(
+                id=name, title=name, content=_manifest_text(tool_manifest(tool))
+            )
+
+    def select(
+        self,
+        tools: List[BaseTool],
+        query: str,
+        *,
+        keep: Iterable[str] = (),
+        sticky: bool = False,
+    ) -> List[BaseTool]:
+        """
+        Return the pinned tools, the `keep` tools and the top-k tools for
+        `query`, in registry order; with `sticky`, add them to the recently
+        selected tools and return those, pinned first.
+        """
+        self.sync(tools)
+        names = set(self.pinned).union(keep)
+        # Tools bound anyway do not take up any of the k routed slots.
+        ranked = [
+            name
+            for name in self._index.rank_items(query, k=self.top_k + len(names))
+            if name not in names
+        ][: self.top_k]
+        for tool in tools:
+            if len(ranked) >= self.top_k:
+                break
+            if tool.name not in names and tool.name not in ranked:
+                ranked.append(tool.name)
+        names.update(ranked)
+        if not sticky:
+            return [t for t in tools if t.name in names]
+        self._selects += 1
+        current = [t.name for t in tools if t.name in names - set(self.pinned)]
+        for name in current:
+            self._sticky[name] = self._selects
+        # Evict the least recently selected tools beyond top-k.
+        excess = len(self._sticky) - max(self.top_k, len(current))
+        if excess > 0:
+            stale = sorted(
+                (n for n in self._sticky if n not in current),
+                key=self._sticky.__getitem__,
+            )
+            for name in stale[:excess]:
+                del self._sticky[name]
+        by_name = {t.name: t for t in tools}
+        order = [n for n in self.pinned if n in by_name]
+        order += [n for n in self._sticky if n not in order]
+        return [by_name[n] for n in order]
+
+    def bound_model(
+        self,
+        chat_model: Any,
+        tools: List[BaseTool],
+        bind: Callable[[List[BaseTool]], Any],
+    ) -> Any:
+        key = (id(chat_model), tuple(sorted(t.name for t in tools)))
+        cached = self._bound.get(key)
+        # Keep the model alongside the binding so a reused id() cannot match.
+        if cached is not None and cached[0] is chat_model:
+            self._bound.move_to_end(key)
+            return cached[1]
+        bound = bind(tools)
+        self._bound[key] = (chat_model, bound)
+        if len(self._bound) > _BOUND_CACHE_SIZE:
+            self._bound.popitem(last=False)
+        return bound
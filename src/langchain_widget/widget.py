@@ -4,16 +4,23 @@ import asyncio
 import datetime as _dt
 import uuid
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 
 import anywidget
 import traitlets
 
-from langchain_core.tools import BaseTool
-
-from .history import HistoryStore
+from .retrieval import ContextIndex
 from .runtime.langchain_runtime import LangChainToolCallingRuntime
-from .tools import tool_manifest
+from .tools import ToolRouter, tool_manifest
+
+if TYPE_CHECKING:
+    from langchain_core.tools import BaseTool
+
+    from .history import HistoryStore
+    from .runtime.resilience import ResiliencePolicy
+
+
+_HISTORY_INDEX_LIMIT = 50
 
 
 def _now_iso() -> str:
@@ -31,9 +38,19 @@ class LangChainWidget(anywidget.AnyWidget):
     tools = traitlets.List(traitlets.Dict()).tag(sync=True)
     context_items = traitlets.List(traitlets.Dict()).tag(sync=True)
     history_index = traitlets.List(traitlets.Dict()).tag(sync=True)
+    can_resume = traitlets.Bool(False).tag(sync=True)
+    # Number of older messages kept in the history store instead of `messages`.
+    earlier_count = traitlets.Int(0).tag(sync=True)
 
     def _settings_default(self) -> Dict[str, Any]:
-        return {"system_prompt": "", "max_steps": 8}
+        return {
+            "system_prompt": "",
+            "max_steps": 8,
+            "eager_tool_execution": False,
+            "context_top_k": None,
+            "tool_top_k": None,
+            "pinned_tools": [],
+        }
 
     def _messages_default(self) -> List[Dict[str, Any]]:
         return []
@@ -54,12 +71,24 @@ class LangChainWidget(anywidget.AnyWidget):
         tools: Any = None,
         system_prompt: str = "",
         max_steps: int = 8,
+        eager_tool_execution: bool = False,
+        context_top_k: Optional[int] = None,
+        tool_top_k: Optional[int] = None,
+        pinned_tools: Optional[List[str]] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        fallback_models: Optional[List[Any]] = None,
+        transcript_window: Optional[int] = None,
+        runtime_window: Optional[int] = None,
+        cache_breakpoints: Optional[bool] = None,
+        checkpoints: bool = False,
         title: str = "Agent Chat",
         history_path: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
         super().__init__(**kwargs)
         self._chat_model = chat_model
+        self._resilience = resilience
+        self._fallback_models = list(fallback_models or [])
         self.title = title
         if tools is None:
             tools_list: List[BaseTool] = []
@@ -69,100 +98,337 @@ class LangChainWidget(anywidget.AnyWidget):
             tools_list = list(tools)
 
         self._registered_tools = tools_list
-        self.settings = {"system_prompt": system_prompt, "max_steps": max_steps}
+        self.settings = {
+            "system_prompt": system_prompt,
+            "max_steps": max_steps,
+            "eager_tool_execution": eager_tool_execution,
+            "context_top_k": context_top_k,
+            "tool_top_k": tool_top_k,
+            "pinned_tools": list(pinned_tools or []),
+            "cache_breakpoints": cache_breakpoints,
+            "checkpoints": checkpoints,
+        }
         self.tools = [tool_manifest(t) for t in self._registered_tools]
 
-        self._history = HistoryStore(Path(history_path) if history_path else None)
-        self._refresh_history_index()
+        self._context_index = ContextIndex()
+        self._tool_router = ToolRouter()
+        # The SQLite store is opened on first history access (see `_history`);
+        # the frontend requests `history_refresh` when the sidebar mounts.
+        self._history_path = Path(history_path) if history_path else None
+        self._history_store: Optional[HistoryStore] = None
+        self._history_index_loaded = False
         self._active_conversation_id: Optional[str] = None
         self._history_dirty: bool = False
+        # With a window, only the last `transcript_window` messages stay in
+        # `messages`; older ones live in the store under their absolute
+        # position (`seq`). The first `_spilled_total` messages are in the
+        # store, the first `_saved_total` of them in the saved conversation
+        # (those are never spilled), and `messages[0]` is at position
+        # `earlier_count`.
+        self._transcript_window = transcript_window
+        self._spilled_total = 0
+        self._saved_total = 0
+        # The window only bounds what is synced to the frontend; the model
+        # sees the whole transcript unless `runtime_window` bounds it too.
+        self._runtime_window = runtime_window
 
         self._task: Optional[asyncio.Task[None]] = None
         self.on_msg(self._on_frontend_msg)
 
+    @property
+    def _history(self) -> HistoryStore:
+        if self._history_store is None:
+            from .history import HistoryStore
+
+            # Widgets on the same path share one store and its change feed.
+            self._history_store = HistoryStore.shared(self._history_path)
+            self._history_store.subscribe(self._on_history_change)
+            self._history_store.hold_transcript(self._held_transcript)
+            self._history_store.start_polling()
+        return self._history_store
+
     def _refresh_history_index(self) -> None:
-        self.history_index = [h.to_dict() for h in self._history.list(limit=50)]
+        items = self._history.list(limit=_HISTORY_INDEX_LIMIT)
+        self.history_index = [h.to_dict() for h in items]
+        self._history_index_loaded = True
 
-    def add_context(self, *, title: str, content: str, id: Optional[str] = None) -> str:
+    def _on_history_change(self, changes: List[Dict[str, Any]]) -> None:
+        if not self._history_index_loaded or any(c["op"] == "reload" for c in changes):
+            self._refresh_history_index()
+            return
+        index = {h["id"]: h for h in self.history_index}
+        was_full = len(index) >= _HISTORY_INDEX_LIMIT
+        for change in changes:
+            if change["op"] == "upsert":
+                index[change["item"]["id"]] = change["item"]
+            elif index.pop(change["id"], None) is not None and was_full:
+                # An older conversation may now belong in the index.
+                self._refresh_history_index()
+                return
+        ordered = sorted(index.values(), key=lambda h: h["updated_at"], reverse=True)
+        self.history_index = ordered[:_HISTORY_INDEX_LIMIT]
+
+    def _context_item(
+        self, *, id: str, title: str, content: str, pinned: bool
+    ) -> Dict[str, Any]:
+        # Pinned items are always sent, as part of the cacheable prompt prefix,
+        # so they stay out of the retrieval index.
+        item: Dict[str, Any] = {"id": id, "title": title, "content": content}
+        if pinned:
+            item["pinned"] = True
+            self._context_index.remove(id)
+        else:
+            self._context_index.upsert(id=id, title=title, content=content)
+        return item
+
+    def add_context(
+        self,
+        *,
+        title: str,
+        content: str,
+        id: Optional[str] = None,
+        pinned: bool = False,
+    ) -> str:
         context_id = id or str(uuid.uuid4())
         items = list(self.context_items)
-        items.append({"id": context_id, "title": title, "content": content})
+        items.append(
+            self._context_item(
+                id=context_id, title=title, content=content, pinned=pinned
+            )
+        )
         self.context_items = items
         return context_id
 
-    def upsert_context(self, *, id: str, title: str, content: str) -> str:
+    def upsert_context(
+        self, *, id: str, title: str, content: str, pinned: bool = False
+    ) -> str:
         items = list(self.context_items)
-        for i, item in enumerate(items):
-            if item.get("id") == id:
-                items[i] = {"id": id, "title": title, "content": content}
-                self.context_items = items
-                return id
-        items.append({"id": id, "title": title, "content": content})
+        item = self._context_item(id=id, title=title, content=content, pinned=pinned)
+        for i, existing in enumerate(items):
+            if existing.get("id") == id:
+                items[i] = item
+                break
+        else:
+            items.append(item)
         self.context_items = items
         return id
 
     def remove_context(self, id: str) -> None:
         self.context_items = [c for c in self.context_items if c.get("id") != id]
+        self._context_index.remove(id)
 
     def clear_context(self) -> None:
         self.context_items = []
+        self._context_index.clear()
 
     def register_tool(self, tool: BaseTool) -> None:
         self._registered_tools.append(tool)
         self.tools = [tool_manifest(t) for t in self._registered_tools]
 
     def clear(self) -> None:
+        self._discard_spill()
         self.messages = []
         self._active_conversation_id = None
         self._history_dirty = False
+        self.can_resume = False
+        self._reset_window()
+
+    def iter_transcript(self) -> Iterator[Dict[str, Any]]:
+        """Yield the whole transcript, paging spilled messages in from the store."""
+        if self.earlier_count:
+            yield from self._history.iter_spilled(
+                id=str(self._active_conversation_id), stop=self.earlier_count
+            )
+        yield from list(self.messages)
+
+    def load_earlier(self, count: Optional[int] = None) -> int:
+        """Page up to `count` older messages back into `messages`."""
+        if not self.earlier_count:
+            return 0
+        count = count or self._transcript_window or self.earlier_count
+        start = max(0, self.earlier_count - count)
+        older = self._history.load_spilled(
+            id=str(self._active_conversation_id), start=start, stop=self.earlier_count
+        )
+        # Paged-in messages are trimmed again on the next append.
+        self.messages = older + list(self.messages)
+        self.earlier_count = start
+        return len(older)
+
+    def _reset_window(self) -> None:
+        self._spilled_total = 0
+        self._saved_total = 0
+        self.earlier_count = 0
+
+    def _held_transcript(self) -> Optional[Tuple[str, int]]:
+        """The saved messages this transcript still reads from the store."""
+        if not self._saved_total or self._active_conversation_id is None:
+            return None
+        return self._active_conversation_id, self._saved_total
+
+    def _discard_spill(self) -> None:
+        """Drop the spilled messages of the conversation being left."""
+        # Saved messages stay in the saved conversation; unsaved ones (and
+        # copies kept when the saved conversation was deleted) are abandoned,
+        # unless a checkpoint can still resume them.
+        if (self._spilled_total or self._saved_total) and not self.can_resume:
+            self._history.delete_spilled(id=str(self._active_conversation_id))
+
+    def _ensure_conversation_id(self) -> str:
+        if self._active_conversation_id is None:
+            self._active_conversation_id = str(uuid.uuid4())
+        return self._active_conversation_id
+
+    def _trim_window(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        window = self._transcript_window
+        if window is None or len(messages) <= window:
+            return messages
+        drop = len(messages) - window
+        # Paged-in and saved messages are already in the store; only spill
+        # the others.
+        stored = max(self._spilled_total, self._saved_total)
+        first_unstored = max(0, stored - self.earlier_count)
+        if first_unstored < drop:
+            self._history.spill_messages(
+                id=self._ensure_conversation_id(),
+                start_seq=self.earlier_count + first_unstored,
+                messages=messages[first_unstored:drop],
+            )
+        self._spilled_total = max(self._spilled_total, self.earlier_count + drop)
+        self.earlier_count += drop
+        return messages[drop:]
+
+    def _runtime_transcript(self) -> List[Dict[str, Any]]:
+        """
+        The transcript sent to the model, paging spilled messages back in.
+
+        This is the whole transcript, or with `runtime_window` its last
+        `runtime_window` messages, extended back to the user message that
+        starts their turn so no turn is cut in half.
+        """
+        return self._read_transcript(*self._transcript_view())
+
+    def _transcript_view(self) -> Tuple[str, int, List[Dict[str, Any]]]:
+        return (
+            str(self._active_conversation_id),
+            self.earlier_count,
+            list(self.messages),
+        )
+
+    def _read_transcript(
+        self, convo_id: str, earlier_count: int, resident: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        # Only reads the store, so it can run off the event loop on a view
+        # taken on it.
+        if self._runtime_window is None:
+            if not earlier_count:
+                return resident
+            spilled = self._history.iter_spilled(id=convo_id, stop=earlier_count)
+            return [*spilled, *resident]
+        start = max(0, earlier_count + len(resident) - self._runtime_window)
+        turn_start = None
+        for i in range(start - earlier_count, -1, -1):
+            if i < len(resident) and resident[i].get("role") == "user":
+                turn_start = earlier_count + i
+                break
+        if turn_start is None and earlier_count:
+            turn_start = self._history.last_spilled_seq(
+                id=convo_id, before=min(start, earlier_count - 1) + 1, role="user"
+            )
+        start = start if turn_start is None else turn_start
+        if start >= earlier_count:
+            return resident[start - earlier_count :]
+        return (
+            self._history.load_spilled(id=convo_id, start=start, stop=earlier_count)
+            + resident
+        )
+
+    def resume(self, id: Optional[str] = None) -> bool:
+        """
+        Continue an interrupted run from its last completed step.
+
+        `id` defaults to the active conversation; after a kernel restart pass
+        an id from `HistoryStore.list_checkpoints()`. Returns False when there
+        is no checkpoint to resume from.
+        """
+        convo_id = id or self._active_conversation_id
+        if not convo_id:
+            return False
+        checkpoint = self._history.load_checkpoint(id=convo_id)
+        if checkpoint is None:
+            return False
+        # The checkpointed transcript matches the checkpointed step exactly;
+        # its first `transcript_offset` messages are already spilled.
+        offset = int(checkpoint["state"].get("transcript_offset") or 0)
+        if convo_id != self._active_conversation_id:
+            self._discard_spill()
+            self._saved_total = 0
+        self._active_conversation_id = convo_id
+        self._spilled_total = offset
+        self.earlier_count = offset
+        self.messages = checkpoint["messages"]
+        self._history_dirty = True
+        self._start_run(checkpoint=checkpoint["state"])
+        return True
 
     def _append_message(self, message: Dict[str, Any]) -> None:
         msgs = list(self.messages)
         msgs.append(message)
-        self.messages = msgs
+        self.messages = self._trim_window(msgs)
         self._history_dirty = True
 
     def _on_frontend_msg(
         self, _widget: Any, content: Dict[str, Any], _buffers: Any
     ) -> None:
         msg_type = content.get("type")
+        # Writes below reach `history_index` through `_on_history_change`.
         if msg_type == "history_refresh":
-            self._refresh_history_index()
+            if self._history_index_loaded:
+                self._history.poll()
+            else:
+                self._refresh_history_index()
             return
         if msg_type == "history_clear":
             self._history.clear()
-            self._refresh_history_index()
             return
         if msg_type == "history_delete":
             convo_id = str(content.get("id") or "")
             if convo_id:
                 self._history.delete(id=convo_id)
-            self._refresh_history_index()
             return
         if msg_type == "history_load":
             convo_id = str(content.get("id") or "")
             if not convo_id:
                 return
-            self.messages = self._history.load_messages(id=convo_id)
+            messages = self._history.load_messages(id=convo_id)
+            self._discard_spill()
             self._active_conversation_id = convo_id
+            self._reset_window()
+            self._saved_total = len(messages)
+            self.messages = self._trim_window(messages)
             self._history_dirty = False
+            self.can_resume = self._history.load_checkpoint(id=convo_id) is not None
             self.send({"type": "scroll_to_bottom"})
             return
         if msg_type == "history_save":
             self._save_current_conversation(convo_id=self._active_conversation_id)
             self._history_dirty = False
-            self._refresh_history_index()
             return
         if msg_type == "history_new_chat":
             if self._history_dirty:
                 self._save_current_conversation(convo_id=self._active_conversation_id)
             self.clear()
-            self._refresh_history_index()
             return
 
         if msg_type == "reset":
             self.clear()
             return
+        if msg_type == "resume":
+            self.resume(str(content.get("id") or "") or None)
+            return
+        if msg_type == "load_earlier":
+            self.load_earlier(content.get("count"))
+            return
         if msg_type == "cancel":
             if self._task and not self._task.done():
                 self._task.cancel()
@@ -186,7 +452,7 @@ class LangChainWidget(anywidget.AnyWidget):
         self._start_run()
 
     def _save_current_conversation(self, convo_id: Any = None) -> None:
-        messages = list(self.messages)
+        messages = list(self.iter_transcript())
         if not messages:
             return
         convo_id = str(convo_id or self._active_conversation_id or uuid.uuid4())
@@ -205,30 +471,62 @@ class LangChainWidget(anywidget.AnyWidget):
             messages=messages,
         )
         self._active_conversation_id = convo_id
+        # The saved conversation now holds every spilled message.
+        self._saved_total = len(messages)
+        self._history.delete_spilled(id=convo_id)
 
-    def _start_run(self) -> None:
+    def _start_run(self, checkpoint: Optional[Dict[str, Any]] = None) -> None:
         if self._task and not self._task.done():
             self._task.cancel()
         try:
             loop = asyncio.get_running_loop()
         except RuntimeError:
             loop = asyncio.get_event_loop()
-        self._task = loop.create_task(self._run_agent())
+        self._task = loop.create_task(self._run_agent(checkpoint=checkpoint))
 
     async def _emit(self, event: Dict[str, Any]) -> None:
         self.send(event)
 
-    async def _run_agent(self) -> None:
+    async def _run_agent(self, checkpoint: Optional[Dict[str, Any]] = None) -> None:
+        self.can_resume = False
+        convo_id = self._ensure_conversation_id()
+        settings = self.settings or {}
+        checkpoints = bool(settings.get("checkpoints", False))
+        if checkpoint is None and checkpoints:
+            # A new user turn supersedes any checkpoint of an earlier run.
+            await asyncio.to_thread(self._history.delete_checkpoint, id=convo_id)
+        # A resumed run keeps its stored checkpoint until it writes a new one.
+        checkpointed = checkpoint is not None
+        # Absolute transcript position up to which this run's checkpoint log
+        # holds the messages; None until the first entry of a new run.
+        logged: Optional[int] = (
+            None if checkpoint is None else self.earlier_count + len(self.messages)
+        )
         try:
-            max_steps = int((self.settings or {}).get("max_steps", 8))
+            max_steps = int(settings.get("max_steps", 8))
+            context_top_k = settings.get("context_top_k")
+            tool_router: Optional[ToolRouter] = None
+            if settings.get("tool_top_k") is not None:
+                tool_router = self._tool_router
+                tool_router.top_k = int(settings["tool_top_k"])
+                tool_router.pinned = list(settings.get("pinned_tools") or [])
             runtime = LangChainToolCallingRuntime(
                 chat_model=self._chat_model,
                 tools=self._registered_tools,
-                system_prompt=(self.settings or {}).get("system_prompt", ""),
+                system_prompt=settings.get("system_prompt", ""),
                 max_steps=max_steps,
+                eager_tool_execution=bool(settings.get("eager_tool_execution", False)),
+                context_top_k=None if context_top_k is None else int(context_top_k),
+                context_index=self._context_index,
+                tool_router=tool_router,
+                resilience=self._resilience,
+                fallback_models=self._fallback_models,
+                cache_breakpoints=settings.get("cache_breakpoints"),
+                checkpoints=checkpoints,
             )
 
             async def on_event(event: Dict[str, Any]) -> None:
+                nonlocal checkpointed, logged
                 et = event.get("type")
                 if et == "status":
                     self.status = event.get("status", "idle")
@@ -249,10 +547,43 @@ class LangChainWidget(anywidget.AnyWidget):
                     await self._emit({"type": "scroll_to_bottom"})
                     return
 
-                if et == "tool_start":
+                if et in (
+                    "tool_start",
+                    "model_retry",
+                    "model_hedge",
+                    "model_fallback",
+                    "model_call",
+                    "prompt_cache",
+                ):
                     await self._emit(event)
                     return
 
+                if et == "checkpoint":
+                    state = event.get("state")
+                    if state is None:
+                        await asyncio.to_thread(
+                            self._history.delete_checkpoint, id=convo_id
+                        )
+                    else:
+                        total = self.earlier_count + len(self.messages)
+                        # Messages spilled since the last entry are below
+                        # `transcript_offset` and not needed to resume.
+                        count = total - (
+                            self._spilled_total if logged is None else logged
+                        )
+                        new = list(self.messages)[max(0, len(self.messages) - count) :]
+                        await asyncio.to_thread(
+                            self._history.append_checkpoint,
+                            id=convo_id,
+                            updated_at=_now_iso(),
+                            state=dict(state, transcript_offset=self._spilled_total),
+                            transcript_start=total - len(new),
+                            messages=new,
+                        )
+                        logged = total
+                    checkpointed = state is not None
+                    return
+
                 if et == "tool_end":
                     self._append_message(
                         {
@@ -279,12 +610,19 @@ class LangChainWidget(anywidget.AnyWidget):
                     await self._emit({"type": "scroll_to_bottom"})
                     return
 
-            await runtime.run(
-                messages=list(self.messages),
-                context_items=list(self.context_items),
-                settings=dict(self.settings or {}),
-                on_event=on_event,
-            )
+            if checkpoint is not None:
+                await runtime.resume(checkpoint=checkpoint, on_event=on_event)
+            else:
+                # Paging a long spilled transcript in must not block the kernel.
+                transcript = await asyncio.to_thread(
+                    self._read_transcript, *self._transcript_view()
+                )
+                await runtime.run(
+                    messages=transcript,
+                    context_items=list(self.context_items),
+                    settings=dict(self.settings or {}),
+                    on_event=on_event,
+                )
         except asyncio.CancelledError:
             await self._emit({"type": "status", "status": "idle"})
             raise
@@ -299,3 +637,5 @@ class LangChainWidget(anywidget.AnyWidget):
                 }
             )
             await self._emit({"type": "scroll_to_bottom"})
+        finally:
+            self.can_resume = checkpointed
@@ -0,0 +1,190 @@
+from datetime import date
+
+import pytest
+
+from langchain_widget import history
+from langchain_widget.cli import main
+from langchain_widget.history import HistoryStore, iter_jsonl
+
+
+def _fill(store, n):
+    for i in range(n):
+        store.upsert(
+            id=f"c{i}",
+            title=f"Conversation {i}",
+            created_at=f"2026-01-{i + 1:02d}T00:00:00+00:00",
+            updated_at=f"2026-01-{i + 1:02d}T00:00:00+00:00",
+            messages=[{"id": f"m{i}", "role": "user", "content": f"hello {i}"}],
+        )
+
+
+def test_export_import_roundtrip_compressed(tmp_path):
+    source = HistoryStore(tmp_path / "source.sqlite")
+    _fill(source, 5)
+
+    path = tmp_path / "history.jsonl.gz"
+    assert source.export(path) == 5
+    assert [r["id"] for r in iter_jsonl(path)] == ["c0", "c1", "c2", "c3", "c4"]
+
+    target = HistoryStore(tmp_path / "target.sqlite")
+    assert target.import_(path, batch_size=2) == 5
+    assert [h.id for h in target.list()] == ["c4", "c3", "c2", "c1", "c0"]
+    assert target.load_messages(id="c3")[0]["content"] == "hello 3"
+
+
+def test_export_filters_and_import_keeps_newer_rows(tmp_path):
+    store = HistoryStore(tmp_path / "history.sqlite")
+    _fill(store, 5)
+
+    path = tmp_path / "subset.jsonl"
+    count = store.export(
+        path, since="2026-01-02", until="2026-01-04T23:59:59", ids=["c1", "c3", "c4"]
+    )
+    assert count == 2
+    assert [r["id"] for r in iter_jsonl(path)] == ["c1", "c3"]
+
+    store.upsert(
+        id="c1",
+        title="Edited",
+        created_at="2026-01-02T00:00:00+00:00",
+        updated_at="2026-02-01T00:00:00+00:00",
+        messages=[],
+    )
+    store.import_(path)
+    assert store.load_messages(id="c1") == []
+
+
+def test_date_only_bounds_cover_the_whole_day(tmp_path):
+    store = HistoryStore(tmp_path / "history.sqlite")
+    store.upsert(
+        id="late",
+        title="Late",
+        created_at="2026-01-31T10:00:00+00:00",
+        updated_at="2026-01-31T10:00:00+00:00",
+        messages=[],
+    )
+
+    for until in ("2026-01-31", date(2026, 1, 31)):
+        assert [r["id"] for r in store.iter_conversations(until=until)] == ["late"]
+    assert list(store.iter_conversations(until="2026-01-30")) == []
+    assert list(store.iter_conversations(since=date(2026, 2, 1))) == []
+
+    path = tmp_path / "history.jsonl"
+    assert store.export(path, since="2026-01-31", until="2026-01-31") == 1
+    target = HistoryStore(tmp_path / "target.sqlite")
+    assert target.import_(path, until=date(2026, 1, 31)) == 1
+
+
+def test_streamed_export_does_not_block_writers(tmp_path):
+    store = HistoryStore(tmp_path / "history.sqlite")
+    _fill(store, 4)
+    store.upsert(
+        id="c1b",
+        title="Same time as c1",
+        created_at="2026-01-02T00:00:00+00:00",
+        updated_at="2026-01-02T00:00:00+00:00",
+        messages=[],
+    )
+
+    rows = store.iter_conversations(batch_size=2)
+    assert next(rows)["id"] == "c0"
+    # A write while the export is suspended neither blocks nor fails.
+    store.upsert(
+        id="new",
+        title="New",
+        created_at="2026-03-01T00:00:00+00:00",
+        updated_at="2026-03-01T00:00:00+00:00",
+        messages=[],
+    )
+    assert [r["id"] for r in rows] == ["c1", "c1b", "c2", "c3", "new"]
+
+
+def test_iter_spilled_merges_saved_and_spilled_messages(tmp_path):
+    store = HistoryStore(tmp_path / "history.sqlite")
+    messages = [{"id": f"m{i}", "role": "user"} for i in range(5)]
+    store.upsert(
+        id="c", title="C", created_at="t", updated_at="t", messages=messages[:3]
+    )
+    store.spill_messages(id="c", start_seq=3, messages=messages[3:])
+
+    assert list(store.iter_spilled(id="c", stop=5, batch_size=1)) == messages
+    assert store.load_spilled(id="c", start=2, stop=4) == messages[2:4]
+
+    # Missing positions are an error, not a shorter transcript.
+    store.delete(id="c")
+    with pytest.raises(KeyError):
+        list(store.iter_spilled(id="c", stop=5))
+    with pytest.raises(KeyError):
+        store.load_spilled(id="c", start=0, stop=4)
+
+
+def test_cli_export_import(tmp_path, capsys):
+    db = tmp_path / "history.sqlite"
+    _fill(HistoryStore(db), 3)
+    path = tmp_path / "history.jsonl.xz"
+
+    assert main(["--db", str(db), "export", str(path), "--id", "c2"]) == 0
+    assert "Exported 1 conversations" in capsys.readouterr().out
+
+    target = tmp_path / "target.sqlite"
+    assert main(["--db", str(target), "import", str(path)]) == 0
+    assert [h.id for h in HistoryStore(target).list()] == ["c2"]
+
+
+def test_shared_store_publishes_changed_rows(tmp_path):
+    path = tmp_path / "history.sqlite"
+    store = HistoryStore.shared(path)
+    assert HistoryStore.shared(str(path)) is store
+
+    received = []
+    unsubscribe = store.subscribe(received.append)
+    _fill(store, 2)
+    store.delete(id="c0")
+    assert [[c["op"] for c in batch] for batch in received] == [
+        ["upsert"],
+        ["upsert"],
+        ["delete"],
+    ]
+    assert received[1][0]["item"]["id"] == "c1"
+
+    unsubscribe()
+    store.delete(id="c1")
+    assert len(received) == 3
+
+
+def test_poll_detects_writes_from_other_connections(tmp_path):
+    path = tmp_path / "history.sqlite"
+    store = HistoryStore(path)
+    received = []
+    store.subscribe(received.append)
+    assert store.poll() is True  # first poll records the data version
+    received.clear()
+    assert store.poll() is False
+
+    # A separate store stands in for another process writing to the file.
+    _fill(HistoryStore(path), 1)
+    assert store.poll() is True
+    assert received == [
+        [{"op": "upsert", "item": store.list()[0].to_dict()}],
+    ]
+    assert store.poll() is False
+
+
+def test_change_log_is_pruned_without_subscribers(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, "_CHANGE_LOG_RETENTION", 10)
+    source = HistoryStore(tmp_path / "source.sqlite")
+    _fill(source, 30)
+    path = tmp_path / "history.jsonl"
+    source.export(path)
+
+    target = HistoryStore(tmp_path / "target.sqlite")
+    assert target.import_(path, batch_size=7) == 30
+    with target._connect() as conn:
+        seqs = [r[0] for r in conn.execute("SELECT seq FROM history_changes")]
+    assert seqs == list(range(21, 31))
+    # Stores opened later prune what plain writers left behind.
+    with source._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM history_changes").fetchone()[0] == 30
+    HistoryStore(tmp_path / "source.sqlite")
+    with source._connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM history_changes").fetchone()[0] == 10
@@ -0,0 +1,50 @@
+import re
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ("anywidget", "traitlets", "sqlite3", "langchain_core.tools")
+
+
+def _import_in_subprocess(module, *extra_args):
+    code = (
+        f"import sys; import {module}; "
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    return subprocess.run(
+        [sys.executable, *extra_args, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "langchain_widget",
+        "langchain_widget.runtime.langchain_runtime",
+        "langchain_widget.testing",
+    ],
+)
+def test_import_does_not_load_heavy_modules(module):
+    result = _import_in_subprocess(module)
+    assert result.stdout.strip() == "[]"
+
+
+def test_package_import_time_budget():
+    # `-X importtime` reports cumulative microseconds per module on stderr.
+    result = _import_in_subprocess("langchain_widget", "-X", "importtime")
+    match = re.search(r"\|\s*(\d+)\s*\|\s*langchain_widget$", result.stderr, re.M)
+    assert match is not None
+    assert int(match.group(1)) < 50_000
+
+
+def test_lazy_attribute_access():
+    import langchain_widget
+
+    assert "LangChainWidget" in dir(langchain_widget)
+    assert langchain_widget.LangChainWidget.__name__ == "LangChainWidget"
+    with pytest.raises(AttributeError):
+        langchain_widget.does_not_exist
@@ -0,0 +1,610 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.tools import tool
+
+from langchain_widget import TestChatModel, tool_call
+from langchain_widget.retrieval import ContextIndex
+from langchain_widget.runtime import LangChainToolCallingRuntime, ResiliencePolicy
+from langchain_widget.runtime.base import merge_checkpoint
+from langchain_widget.runtime.langchain_runtime import _completed_tool_calls
+from langchain_widget.tools import ToolRouter
+
+
+@tool
+def add(a: int, b: int) -> int:
+    "Add two integers."
+    return a + b
+
+
+def _run(runtime, messages, context_items=None, settings=None):
+    events = []
+
+    async def on_event(event):
+        events.append(event)
+
+    asyncio.run(
+        runtime.run(
+            messages=messages,
+            context_items=context_items or [],
+            settings=settings or {},
+            on_event=on_event,
+        )
+    )
+    return events
+
+
+def test_eager_tool_execution_keeps_event_order():
+    model = TestChatModel(
+        [
+            AIMessage(
+                content="Calling tools.",
+                tool_calls=[
+                    tool_call(id="call_1", name="add", args={"a": 1, "b": 2}),
+                    tool_call(id="call_2", name="add", args={"a": 3, "b": 4}),
+                ],
+            ),
+            AIMessage(content="Done."),
+        ]
+    )
+    runtime = LangChainToolCallingRuntime(
+        chat_model=model, tools=[add], eager_tool_execution=True
+    )
+    events = _run(runtime, [{"role": "user", "content": "sum"}])
+
+    tool_events = [
+        (e["type"], e["tool_call_id"])
+        for e in events
+        if e["type"] in ("tool_start", "tool_end")
+    ]
+    assert tool_events == [
+        ("tool_start", "call_1"),
+        ("tool_end", "call_1"),
+        ("tool_start", "call_2"),
+        ("tool_end", "call_2"),
+    ]
+    assert [e["content"] for e in events if e["type"] == "tool_end"] == ["3", "7"]
+    replies = [e for e in events if e["type"] == "assistant_message"]
+    assert replies[-1]["content"] == "Done."
+
+
+def test_eager_tool_execution_overlaps_generation():
+    first_tool_ran = asyncio.Event()
+
+    @tool
+    async def ping() -> str:
+        "Record that the tool ran."
+        first_tool_ran.set()
+        return "pong"
+
+    class SlowStreamModel(TestChatModel):
+        async def astream(self, messages):
+            if self._index:
+                yield AIMessageChunk(content="Done.")
+                return
+            self._index += 1
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    tool_call_chunk(name="ping", args="{}", id="call_1", index=0)
+                ],
+            )
+            # Only finishes if the first call was dispatched mid-stream.
+            await asyncio.wait_for(first_tool_ran.wait(), timeout=1)
+            yield AIMessageChunk(content="still generating")
+
+    runtime = LangChainToolCallingRuntime(
+        chat_model=SlowStreamModel([]), tools=[ping], eager_tool_execution=True
+    )
+    events = _run(runtime, [{"role": "user", "content": "ping"}])
+
+    assert [e["content"] for e in events if e["type"] == "tool_end"] == ["pong"]
+    assert not any(e["type"] == "error" for e in events)
+
+
+def test_eager_streaming_keeps_message_fields():
+    class ReasoningModel(TestChatModel):
+        async def astream(self, messages):
+            yield AIMessageChunk(content="", additional_kwargs={"reasoning": "hmm"})
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    tool_call_chunk(name="add", args='{"a": 1}', id="call_1", index=0),
+                    tool_call_chunk(name="add", args="[1]", id="call_2", index=1),
+                ],
+            )
+
+    runtime = LangChainToolCallingRuntime(
+        chat_model=ReasoningModel([]), tools=[add], eager_tool_execution=True
+    )
+    ai, started = asyncio.run(
+        runtime._stream_with_eager_tools(ReasoningModel([]), [], {})
+    )
+    for task in started.values():
+        task.cancel()
+
+    assert type(ai) is AIMessage
+    assert ai.additional_kwargs == {"reasoning": "hmm"}
+    assert [c["id"] for c in ai.tool_calls] == ["call_1"]
+    assert [c["id"] for c in ai.invalid_tool_calls] == ["call_2"]
+
+
+def test_completed_tool_calls_only_checks_extended_calls():
+    message = AIMessageChunk(
+        content="",
+        tool_call_chunks=[
+            tool_call_chunk(name="add", args='{"a": 1}', id="call_1", index=0),
+            tool_call_chunk(name="add", args='{"a": 2}', id="call_2", index=1),
+            tool_call_chunk(name="add", args='{"a": 3}', id="call_3", index=2),
+        ],
+    )
+    assert [c.id for c in _completed_tool_calls(message)] == [
+        "call_1",
+        "call_2",
+        "call_3",
+    ]
+    calls = _completed_tool_calls(message, indexes={0, 1}, skip={"call_1"})
+    assert [c.id for c in calls] == ["call_2"]
+
+
+def test_context_retrieval_injects_only_relevant_chunks():
+    class RecordingModel(TestChatModel):
+        async def ainvoke(self, messages):
+            self.seen = list(messages)
+            return await super().ainvoke(messages)
+
+    model = RecordingModel([AIMessage(content="ok")])
+    context_items = [
+        {"id": "a", "title": "Cats", "content": "Cats purr and chase mice."},
+        {"id": "b", "title": "Rockets", "content": "Rockets burn fuel to reach orbit."},
+        {"id": "c", "title": "Bread", "content": "Bread needs flour, water and yeast."},
+    ]
+    runtime = LangChainToolCallingRuntime(chat_model=model, context_top_k=1)
+    _run(
+        runtime,
+        [{"role": "user", "content": "How do rockets reach orbit?"}],
+        context_items,
+    )
+
+    prompt = model.seen[0].content
+    assert "[Rockets]" in prompt
+    assert "[Cats]" not in prompt
+    assert "[Bread]" not in prompt
+
+
+def test_context_index_fallbacks():
+    index = ContextIndex()
+    index.sync(
+        [
+            {"title": "", "content": "Cats purr."},
+            {"title": "", "content": "Rockets reach orbit."},
+            {"title": "Bread", "content": "Bread needs yeast."},
+        ]
+    )
+    assert len(index) == 3
+    # No chunk matches: the first k chunks are used instead of nothing.
+    assert [c["title"] for c in index.search("summarize please", k=2)] == ["#0", "#1"]
+
+    # The widget's incremental upserts agree with `sync`, so nothing is re-chunked.
+    index.upsert(id="#2", title="Bread", content="Bread needs yeast.")
+    index.upsert(id="#0", title="", content="Cats purr.")
+    assert [c["id"] for c in index.search("orbit", k=1)] == ["#1#0"]
+    assert list(index._chunks) == ["#0#0", "#1#0", "#2#0"]
+
+
+def test_pinned_context_forms_stable_cacheable_prefix():
+    class RecordingModel(TestChatModel):
+        async def ainvoke(self, messages):
+            self.seen = list(messages)
+            return await super().ainvoke(messages)
+
+    pinned = [
+        {"id": "a", "title": "Style", "content": "Answer briefly.", "pinned": True},
+        {"id": "b", "title": "Glossary", "content": "BM25: ranking.", "pinned": True},
+    ]
+    volatile = [{"id": "c", "title": "Notes", "content": "Rockets reach orbit."}]
+    messages = [
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello!"},
+        {"role": "user", "content": "How do rockets reach orbit?"},
+    ]
+
+    prompts = []
+    for items in (pinned + volatile, volatile + pinned[::-1]):
+        model = RecordingModel([AIMessage(content="ok")])
+        runtime = LangChainToolCallingRuntime(
+            chat_model=model, system_prompt="Be helpful.", cache_breakpoints=True
+        )
+        _run(runtime, messages, items)
+        prompts.append([m.content for m in model.seen])
+
+    assert prompts[0] == prompts[1]
+    [prefix], first, history, [turn] = prompts[0]
+    assert prefix["cache_control"] == {"type": "ephemeral"}
+    assert prefix["text"].startswith("Be helpful.\n\n")
+    assert "[Style]" in prefix["text"] and "[Glossary]" in prefix["text"]
+    assert "[Notes]" not in prefix["text"]
+    # Breakpoints close the history before the latest turn and the request.
+    assert first == "Hi"
+    assert history == [
+        {"type": "text", "text": "Hello!", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert turn == {
+        "type": "text",
+        "text": "[Notes]\nRockets reach orbit.\n\nHow do rockets reach orbit?",
+        "cache_control": {"type": "ephemeral"},
+    }
+
+    # Without prompt caching, all context stays in the system prompt.
+    model = RecordingModel([AIMessage(content="ok")])
+    runtime = LangChainToolCallingRuntime(chat_model=model, system_prompt="Be terse.")
+    _run(runtime, messages, volatile)
+    assert [m.content for m in model.seen] == [
+        "Be terse.\n\n[Notes]\nRockets reach orbit.",
+        "Hi",
+        "Hello!",
+        "How do rockets reach orbit?",
+    ]
+
+    # Without a user turn to attach it to, it stays there with caching too.
+    model = RecordingModel([AIMessage(content="ok")])
+    runtime = LangChainToolCallingRuntime(chat_model=model, cache_breakpoints=True)
+    _run(runtime, [], volatile)
+    [system] = model.seen
+    assert system.content[0]["text"] == "[Notes]\nRockets reach orbit."
+
+
+def test_prompt_cache_usage_is_reported():
+    reply = AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": 1000,
+            "output_tokens": 5,
+            "total_tokens": 1005,
+            "input_token_details": {"cache_read": 800, "cache_creation": 100},
+        },
+    )
+    runtime = LangChainToolCallingRuntime(chat_model=TestChatModel([reply]))
+    events = _run(runtime, [{"role": "user", "content": "hi"}])
+
+    [usage] = [e for e in events if e["type"] == "prompt_cache"]
+    assert usage == {
+        "type": "prompt_cache",
+        "input_tokens": 1000,
+        "cache_read": 800,
+        "cache_creation": 100,
+        "hit_ratio": 0.8,
+    }
+
+
+def test_tool_router_binds_relevant_and_pinned_tools():
+    @tool
+    def get_weather(city: str) -> str:
+        "Get the current weather forecast for a city."
+        return "sunny"
+
+    @tool
+    def convert_currency(amount: float, currency: str) -> str:
+        "Convert an amount of money into another currency."
+        return "42"
+
+    @tool
+    def now() -> str:
+        "Return the current time."
+        return "noon"
+
+    class CountingModel(TestChatModel):
+        binds = 0
+
+        def bind_tools(self, tools):
+            CountingModel.binds += 1
+            return super().bind_tools(tools)
+
+    model = CountingModel([AIMessage(content="ok")])
+    router = ToolRouter(top_k=1, pinned=["now"])
+    tools = [add, get_weather, convert_currency, now]
+    for _ in range(2):
+        runtime = LangChainToolCallingRuntime(
+            chat_model=model, tools=tools, tool_router=router
+        )
+        _run(runtime, [{"role": "user", "content": "What's the weather in Paris?"}])
+
+    assert [t.name for t in model._tools] == ["get_weather", "now"]
+    assert CountingModel.binds == 1
+
+
+def test_tool_router_fills_and_reroutes_on_tool_results():
+    @tool
+    def get_weather(city: str) -> str:
+        "Get the current weather forecast for a city."
+        return "Sunny. Prices for the trip are listed in euros, convert currency."
+
+    @tool
+    def convert_currency(amount: float, currency: str) -> str:
+        "Convert an amount of money into another currency."
+        return "42"
+
+    tools = [add, get_weather, convert_currency]
+    # No tool shares a word with the query: fill up to k in registry order.
+    assert [t.name for t in ToolRouter(top_k=1).select(tools, "hello")] == ["add"]
+
+    class RecordingModel(TestChatModel):
+        bound = []
+
+        async def ainvoke(self, messages):
+            self.bound.append([t.name for t in self._tools])
+            return await super().ainvoke(messages)
+
+    model = RecordingModel(
+        [
+            AIMessage(
+                content="",
+                tool_calls=[
+                    tool_call(id="call_1", name="get_weather", args={"city": "Paris"})
+                ],
+            ),
+            AIMessage(content="Sunny."),
+        ]
+    )
+    runtime = LangChainToolCallingRuntime(
+        chat_model=model, tools=tools, tool_router=ToolRouter(top_k=1)
+    )
+    _run(runtime, [{"role": "user", "content": "What's the weather in Paris?"}])
+    assert model.bound == [["get_weather"], ["get_weather", "convert_currency"]]
+
+
+def test_tool_router_sticky_subset_is_stable_and_capped():
+    @tool
+    def get_weather(city: str) -> str:
+        "Get the current weather forecast for a city."
+        return "sunny"
+
+    @tool
+    def convert_currency(amount: float, currency: str) -> str:
+        "Convert an amount of money into another currency."
+        return "42"
+
+    @tool
+    def now() -> str:
+        "Return the time of day."
+        return "noon"
+
+    router = ToolRouter(top_k=2, pinned=["add"])
+    tools = [add, get_weather, convert_currency, now]
+
+    def select(query):
+        return [t.name for t in router.select(tools, query, sticky=True)]
+
+    assert select("weather forecast") == ["add", "get_weather", "convert_currency"]
+    assert select("convert currency") == ["add", "get_weather", "convert_currency"]
+    # Beyond top-k, the least recently selected tool makes room.
+    assert select("time of day") == ["add", "convert_currency", "now"]
+    for query in ["weather forecast", "convert currency", "time of day"] * 10:
+        assert len(select(query)) <= 3
+
+
+def test_tool_router_bound_cache_is_bounded():
+    router = ToolRouter()
+    model = TestChatModel([])
+    for i in range(100):
+        router.bound_model(model, [add] * (i % 50 + 1), lambda tools: object())
+    assert len(router._bound) <= 32
+
+
+def test_resume_skips_completed_model_calls_and_tools():
+    calls = []
+
+    @tool
+    def record(name: str) -> str:
+        "Record a call."
+        calls.append(name)
+        return name
+
+    script = [
+        AIMessage(
+            content="",
+            tool_calls=[
+                tool_call(id="call_1", name="record", args={"name": "a"}),
+                tool_call(id="call_2", name="record", args={"name": "b"}),
+            ],
+        ),
+        AIMessage(content="Done."),
+    ]
+    deltas = []
+
+    async def interrupt_after_first_tool(event):
+        if event["type"] == "checkpoint" and event["state"]:
+            deltas.append(event["state"])
+            if event["state"]["tool_results"]:
+                raise asyncio.CancelledError
+
+    model = TestChatModel(script)
+    runtime = LangChainToolCallingRuntime(
+        chat_model=model, tools=[record], checkpoints=True
+    )
+    try:
+        asyncio.run(
+            runtime.run(
+                messages=[{"role": "user", "content": "go"}],
+                context_items=[],
+                settings={},
+                on_event=interrupt_after_first_tool,
+            )
+        )
+    except asyncio.CancelledError:
+        pass
+    assert calls == ["a"]
+    # Each checkpoint only carries what changed since the previous one.
+    assert [len(d["messages"]) for d in deltas] == [2, 0]
+    assert deltas[1]["base"] == 2
+    state = None
+    for delta in deltas:
+        state = merge_checkpoint(state, delta)
+    assert len(state["messages"]) == 2
+    assert state["tool_results"] == {"call_1": "a"}
+
+    events = []
+
+    async def on_event(event):
+        events.append(event)
+
+    asyncio.run(runtime.resume(checkpoint=state, on_event=on_event))
+    assert calls == ["a", "b"]
+    assert model._index == 2
+    assert [e["type"] for e in events if e["type"] != "checkpoint"] == [
+        "status",
+        "tool_start",
+        "tool_end",
+        "assistant_message",
+        "status",
+    ]
+    assert events[-2] == {"type": "checkpoint", "state": None}
+
+
+class FlakyModel(TestChatModel):
+    """Fails `failures` times, then sleeps `delays[i]` before each reply."""
+
+    def __init__(self, script, *, failures=0, delays=()):
+        super().__init__(script)
+        self.failures = failures
+        self.delays = list(delays)
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("boom")
+        if self.delays:
+            await asyncio.sleep(self.delays.pop(0))
+        return await super().ainvoke(messages)
+
+
+def test_resilience_retries_then_falls_back():
+    primary = FlakyModel([AIMessage(content="primary")], failures=10)
+    fallback = TestChatModel([AIMessage(content="fallback")])
+    runtime = LangChainToolCallingRuntime(
+        chat_model=primary,
+        fallback_models=[fallback],
+        resilience=ResiliencePolicy(max_retries=1, backoff_base=0.001),
+    )
+    events = _run(runtime, [{"role": "user", "content": "hi"}])
+
+    assert primary.calls == 2
+    types = [e["type"] for e in events]
+    assert types.count("model_retry") == 1
+    assert "model_fallback" in types
+    call = next(e for e in events if e["type"] == "model_call")
+    assert call["model_index"] == 1
+    replies = [e for e in events if e["type"] == "assistant_message"]
+    assert replies[-1]["content"] == "fallback"
+
+
+def test_cache_breakpoints_are_decided_per_model():
+    class AnthropicModel(FlakyModel):
+        _llm_type = "anthropic-chat"
+
+        async def ainvoke(self, messages):
+            self.seen = list(messages)
+            return await super().ainvoke(messages)
+
+    class PlainModel(TestChatModel):
+        async def ainvoke(self, messages):
+            self.seen = list(messages)
+            return await super().ainvoke(messages)
+
+    primary = AnthropicModel([AIMessage(content="primary")], failures=10)
+    fallback = PlainModel([AIMessage(content="fallback")])
+    runtime = LangChainToolCallingRuntime(
+        chat_model=primary,
+        fallback_models=[fallback],
+        system_prompt="Be helpful.",
+        resilience=ResiliencePolicy(max_retries=0, backoff_base=0.001),
+    )
+    _run(runtime, [{"role": "user", "content": "hi"}])
+
+    assert [m.content[0]["cache_control"] for m in primary.seen] == [
+        {"type": "ephemeral"}
+    ] * 2
+    assert [m.content for m in fallback.seen] == ["Be helpful.", "hi"]
+
+
+def test_resilience_deadline_and_hedging():
+    slow_then_fast = FlakyModel([AIMessage(content="ok")], delays=[5, 0])
+    runtime = LangChainToolCallingRuntime(
+        chat_model=slow_then_fast,
+        resilience=ResiliencePolicy(
+            max_retries=0, timeout=2, hedge=True, hedge_delay=0.01
+        ),
+    )
+    events = _run(runtime, [{"role": "user", "content": "hi"}])
+
+    assert slow_then_fast.calls == 2
+    assert any(e["type"] == "model_hedge" for e in events)
+    call = next(e for e in events if e["type"] == "model_call")
+    assert call["hedge_won"] is True
+    assert call["latency"] < 2
+
+    stuck = FlakyModel([AIMessage(content="ok")], delays=[5, 5])
+    runtime = LangChainToolCallingRuntime(
+        chat_model=stuck,
+        resilience=ResiliencePolicy(max_retries=1, timeout=0.01, backoff_base=0.001),
+    )
+    with pytest.raises(TimeoutError):
+        _run(runtime, [{"role": "user", "content": "hi"}])
+    assert stuck.calls == 2
+
+
+def test_hedge_delay_tracks_latency_quantile():
+    policy = ResiliencePolicy(hedge=True, hedge_min_samples=10, hedge_delay=1.0)
+    assert policy.hedge_delay() == 1.0
+    for i in range(1, 101):
+        policy.record_latency(i / 100)
+    assert policy.hedge_delay() == pytest.approx(0.96)
+
+
+def test_eager_retry_does_not_rerun_dispatched_tools():
+    charges = []
+
+    @tool
+    def charge(amount: int) -> str:
+        "Charge a card."
+        charges.append(amount)
+        return "charged"
+
+    class DroppingStreamModel(TestChatModel):
+        attempts = 0
+
+        async def astream(self, messages):
+            if self._index:
+                yield AIMessageChunk(content="Done.")
+                return
+            DroppingStreamModel.attempts += 1
+            # The retried response gets a fresh call id, as real providers do.
+            call_id = f"call_{DroppingStreamModel.attempts}"
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    tool_call_chunk(
+                        name="charge", args='{"amount": 5}', id=call_id, index=0
+                    )
+                ],
+            )
+            await asyncio.sleep(0)
+            if DroppingStreamModel.attempts == 1:
+                raise ConnectionError("stream dropped")
+            self._index += 1
+
+    runtime = LangChainToolCallingRuntime(
+        chat_model=DroppingStreamModel([]),
+        tools=[charge],
+        eager_tool_execution=True,
+        resilience=ResiliencePolicy(max_retries=1, backoff_base=0.001),
+    )
+    events = _run(runtime, [{"role": "user", "content": "charge 5"}])
+
+    assert DroppingStreamModel.attempts == 2
+    assert charges == [5]
+    assert [e["content"] for e in events if e["type"] == "tool_end"] == ["charged"]
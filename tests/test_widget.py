@@ -1,4 +1,5 @@
 import asyncio
+import json
 
 from langchain_core.messages import AIMessage
 from langchain_core.tools import tool
@@ -72,6 +73,8 @@ def test_agent_run_tool_calling_appends_messages(tmp_path):
     assert widget.messages[-1]["content"] == "Result is 5."
     assert any(e.get("type") == "tool_start" for e in emitted)
     assert widget.status == "idle"
+    # Checkpointing is opt-in, so a plain run does not touch the history store.
+    assert not (tmp_path / "history.sqlite").exists()
 
 
 def test_history_save_and_load(tmp_path):
@@ -93,3 +96,276 @@ def test_history_save_and_load(tmp_path):
     widget.clear()
     widget._on_frontend_msg(widget, {"type": "history_load", "id": convo_id}, None)
     assert [m["role"] for m in widget.messages] == ["user", "assistant"]
+
+
+def test_context_index_follows_context_crud(tmp_path):
+    widget = LangChainWidget(
+        chat_model=TestChatModel([AIMessage(content="hi")]),
+        history_path=str(tmp_path / "history.sqlite"),
+        context_top_k=1,
+    )
+    widget.add_context(title="Cats", content="Cats purr.", id="cats")
+    widget.add_context(title="Rockets", content="Rockets reach orbit.", id="rockets")
+    assert widget._context_index.search("orbit", k=1)[0]["title"] == "Rockets"
+
+    widget.upsert_context(id="rockets", title="Boats", content="Boats float.")
+    assert widget._context_index.search("float", k=1)[0]["title"] == "Boats"
+
+    widget.upsert_context(id="rockets", title="Boats", content="Boats.", pinned=True)
+    assert widget.context_items[-1]["pinned"] is True
+    assert len(widget._context_index) == 1
+
+    widget.remove_context("rockets")
+    assert len(widget._context_index) == 1
+    widget.clear_context()
+    assert len(widget._context_index) == 0
+
+
+def test_history_store_is_opened_lazily(tmp_path):
+    path = tmp_path / "history.sqlite"
+    widget = LangChainWidget(
+        chat_model=TestChatModel([AIMessage(content="hi")]),
+        history_path=str(path),
+    )
+    assert not path.exists()
+
+    widget._on_frontend_msg(widget, {"type": "history_refresh"}, None)
+    assert path.exists()
+    assert widget.history_index == []
+
+
+def test_resume_after_max_steps(tmp_path):
+    model = TestChatModel(
+        [
+            AIMessage(
+                content="",
+                tool_calls=[tool_call(id="call_1", name="add", args={"a": 1, "b": 1})],
+            ),
+            AIMessage(content="Result is 2."),
+        ]
+    )
+    widget = LangChainWidget(
+        chat_model=model,
+        tools=[add],
+        max_steps=1,
+        checkpoints=True,
+        history_path=str(tmp_path / "history.sqlite"),
+    )
+    widget.send = lambda event: None  # type: ignore[assignment]
+    widget._append_message(
+        {"id": "u1", "role": "user", "content": "1+1?", "created_at": "t"}
+    )
+    asyncio.run(widget._run_agent())
+    assert widget.can_resume
+    assert widget.messages[-1]["content"].startswith("Error: Max tool steps")
+
+    convo_id = widget._active_conversation_id
+    checkpoint = widget._history.load_checkpoint(id=convo_id)
+    assert [m["role"] for m in checkpoint["messages"]] == ["user", "assistant", "tool"]
+    # Each log entry only holds the transcript messages added since the last.
+    with widget._history._connect() as conn:
+        rows = conn.execute("SELECT messages_json FROM checkpoint_log").fetchall()
+    assert [len(json.loads(r["messages_json"])) for r in rows] == [2, 1, 0]
+
+    widget.messages = checkpoint["messages"]
+    asyncio.run(widget._run_agent(checkpoint=checkpoint["state"]))
+    assert [m["role"] for m in widget.messages] == [
+        "user",
+        "assistant",
+        "tool",
+        "assistant",
+    ]
+    assert widget.messages[-1]["content"] == "Result is 2."
+    assert not widget.can_resume
+    assert widget._history.load_checkpoint(id=convo_id) is None
+
+
+def test_cancelled_resume_keeps_checkpoint(tmp_path):
+    class BlockingModel(TestChatModel):
+        blocked = False
+
+        async def ainvoke(self, messages):
+            if self.blocked:
+                await asyncio.Event().wait()
+            return await super().ainvoke(messages)
+
+    model = BlockingModel(
+        [
+            AIMessage(
+                content="",
+                tool_calls=[tool_call(id="call_1", name="add", args={"a": 1, "b": 1})],
+            ),
+            AIMessage(content="Result is 2."),
+        ]
+    )
+    widget = LangChainWidget(
+        chat_model=model,
+        tools=[add],
+        max_steps=1,
+        checkpoints=True,
+        transcript_window=2,
+        history_path=str(tmp_path / "history.sqlite"),
+    )
+    widget.send = lambda event: None  # type: ignore[assignment]
+
+    async def scenario():
+        widget._append_message(
+            {"id": "u1", "role": "user", "content": "1+1?", "created_at": "t"}
+        )
+        await widget._run_agent()
+        convo_id = widget._active_conversation_id
+
+        model.blocked = True
+        assert widget.resume()
+        await asyncio.sleep(0.01)
+        widget._on_frontend_msg(widget, {"type": "cancel"}, None)
+        await asyncio.gather(widget._task, return_exceptions=True)
+        assert widget.can_resume
+
+        # The spilled messages the checkpoint points at survive a reset.
+        widget._on_frontend_msg(widget, {"type": "reset"}, None)
+        model.blocked = False
+        assert widget.resume(convo_id)
+        await widget._task
+        return [m["role"] for m in widget.iter_transcript()]
+
+    assert asyncio.run(scenario()) == ["user", "assistant", "tool", "assistant"]
+    assert not widget.can_resume
+
+
+def test_transcript_window_spills_and_pages_back(tmp_path):
+    model = TestChatModel(
+        [
+            AIMessage(
+                content="",
+                tool_calls=[tool_call(id="call_1", name="add", args={"a": 2, "b": 3})],
+            ),
+            AIMessage(content="Result is 5."),
+        ]
+    )
+    widget = LangChainWidget(
+        chat_model=model,
+        tools=[add],
+        transcript_window=3,
+        history_path=str(tmp_path / "history.sqlite"),
+    )
+    widget.send = lambda event: None  # type: ignore[assignment]
+    for i in range(4):
+        widget._append_message(
+            {"id": f"m{i}", "role": "assistant", "content": str(i), "created_at": "t"}
+        )
+    widget._append_message(
+        {"id": "u1", "role": "user", "content": "2+3?", "created_at": "t"}
+    )
+    asyncio.run(widget._run_agent())
+
+    assert len(widget.messages) == 3
+    assert widget.earlier_count == 5
+    transcript = list(widget.iter_transcript())
+    assert [m["id"] for m in transcript[:5]] == ["m0", "m1", "m2", "m3", "u1"]
+    assert transcript[-1]["content"] == "Result is 5."
+    # The model sees the whole transcript; a runtime window is extended back
+    # to the spilled user message that starts the turn.
+    assert widget._runtime_transcript() == transcript
+    widget._runtime_window = 3
+    assert [m["role"] for m in widget._runtime_transcript()] == [
+        "user",
+        "assistant",
+        "tool",
+        "assistant",
+    ]
+
+    assert widget.load_earlier(2) == 2
+    assert widget.earlier_count == 3
+    assert [m["id"] for m in widget.messages[:2]] == ["m3", "u1"]
+    widget._append_message(
+        {"id": "a2", "role": "assistant", "content": "more", "created_at": "t"}
+    )
+    assert len(widget.messages) == 3
+    assert [m["id"] for m in widget.iter_transcript()] == [
+        m["id"] for m in transcript
+    ] + ["a2"]
+
+    widget._on_frontend_msg(widget, {"type": "history_save"}, None)
+    convo_id = widget.history_index[0]["id"]
+    assert len(widget._history.load_messages(id=convo_id)) == 9
+    # Saved messages are paged in from the saved conversation instead.
+    assert _spill_rows(widget) == 0
+    assert [m["id"] for m in widget.iter_transcript()][:6] == [
+        m["id"] for m in transcript[:6]
+    ]
+
+    # Unsaved spilled messages are dropped when the conversation is left.
+    for i in range(6):
+        widget._append_message(
+            {"id": f"n{i}", "role": "user", "content": str(i), "created_at": "t"}
+        )
+    # Of the six messages pushed out of the window, three were saved already.
+    assert _spill_rows(widget) == 3
+    widget._on_frontend_msg(widget, {"type": "reset"}, None)
+    assert _spill_rows(widget) == 0
+
+
+def _spill_rows(widget):
+    with widget._history._connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM transcript_spill").fetchone()[0]
+
+
+def test_widgets_sharing_history_receive_changes(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    first = LangChainWidget(
+        chat_model=TestChatModel([AIMessage(content="hi")]), history_path=path
+    )
+    second = LangChainWidget(
+        chat_model=TestChatModel([AIMessage(content="hi")]), history_path=path
+    )
+    second._on_frontend_msg(second, {"type": "history_refresh"}, None)
+    assert first._history is second._history
+
+    first._append_message(
+        {"id": "u1", "role": "user", "content": "hello", "created_at": "t"}
+    )
+    first._on_frontend_msg(first, {"type": "history_save"}, None)
+    assert [h["title"] for h in second.history_index] == ["hello"]
+
+    convo_id = second.history_index[0]["id"]
+    second._on_frontend_msg(second, {"type": "history_delete", "id": convo_id}, None)
+    assert first.history_index == []
+    assert second.history_index == []
+
+
+def test_history_clear_and_delete_keep_open_transcripts(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    first = LangChainWidget(
+        chat_model=TestChatModel([]), transcript_window=2, history_path=path
+    )
+    second = LangChainWidget(chat_model=TestChatModel([]), history_path=path)
+
+    def append(widget, count, prefix):
+        for i in range(count):
+            widget._append_message(
+                {
+                    "id": f"{prefix}{i}",
+                    "role": "user",
+                    "content": "x",
+                    "created_at": "t",
+                }
+            )
+
+    append(first, 6, "m")
+    second._on_frontend_msg(second, {"type": "history_clear"}, None)
+    assert len(list(first.iter_transcript())) == 6
+
+    # Saved messages the window dropped are kept when the save is deleted.
+    first._on_frontend_msg(first, {"type": "history_save"}, None)
+    append(first, 2, "n")
+    convo_id = first._active_conversation_id
+    second._on_frontend_msg(second, {"type": "history_delete", "id": convo_id}, None)
+    assert [m["id"] for m in first.iter_transcript()] == [
+        *(f"m{i}" for i in range(6)),
+        "n0",
+        "n1",
+    ]
+
+    first._on_frontend_msg(first, {"type": "reset"}, None)
+    assert _spill_rows(first) == 0